@@ -0,0 +1,68 @@
+from pathlib import Path
+
+import click
+
+from benchmarks.harness import (
+    BenchmarkParams,
+    find_regressions,
+    format_result,
+    load_history,
+    run_benchmark,
+    save_result,
+)
+
+
+@click.command()
+@click.option("--docs", default=50, show_default=True, help="Statements per run.")
+@click.option("--rows", default=24, show_default=True, help="Rows per statement.")
+@click.option("--pages", default=1, show_default=True, help="Pages per statement.")
+@click.option(
+    "--trailing-pages",
+    default=0,
+    show_default=True,
+    help="Plain text pages after each statement.",
+)
+@click.option("--repeat", default=3, show_default=True, help="Runs, keeps the best.")
+@click.option(
+    "--history",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=Path(".benchmarks/history.jsonl"),
+    show_default=True,
+    help="Results of every run, to compare against.",
+)
+@click.option(
+    "--tolerance",
+    default=0.2,
+    show_default=True,
+    help="Slowdown over the previous run reported as a regression.",
+)
+@click.option("--check", is_flag=True, help="Exit with 1 on regressions.")
+@click.pass_context
+def main(
+    ctx: click.Context,
+    docs: int,
+    rows: int,
+    pages: int,
+    trailing_pages: int,
+    repeat: int,
+    history: Path,
+    tolerance: float,
+    check: bool,
+):
+    params = BenchmarkParams(
+        docs=docs, rows=rows, pages=pages, trailing_pages=trailing_pages
+    )
+    result = run_benchmark(params, repeat)
+    regressions = find_regressions(result, load_history(history), tolerance)
+    save_result(history, result)
+
+    click.echo(format_result(result))
+    for regression in regressions:
+        click.echo(f"REGRESSION {regression}", err=True)
+
+    if check and regressions:
+        ctx.exit(1)
+
+
+if __name__ == "__main__":
+    main()
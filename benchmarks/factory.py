@@ -0,0 +1,44 @@
+"""Rows/sec of `brokerage_statement_factory` on an already decoded statement.
+
+    python -m benchmarks.factory --rows 1040
+
+Compares the default construction with the validated one (`validate=True`),
+which is how every model was built before.
+"""
+import time
+
+import click
+
+from benchmarks.synthetic import MAX_ROWS_PER_PAGE, generate_statement
+from brokerage_statement.factory import brokerage_statement_factory
+from brokerage_statement.pdf.models import BrokerageStatementPdf
+
+
+def rows_per_sec(pdf_statement: BrokerageStatementPdf, validate: bool, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        statement = brokerage_statement_factory([pdf_statement], validate=validate)
+        statement.sold_items(), statement.bought_items()
+        best = min(best, time.perf_counter() - start)
+    return len(statement.items) / best
+
+
+@click.command()
+@click.option("--rows", default=1040, show_default=True, help="Rows per statement.")
+@click.option("--repeat", default=5, show_default=True, help="Runs, keeps the best.")
+def main(rows: int, repeat: int):
+    pages = -(-rows // MAX_ROWS_PER_PAGE)
+    pdf_statement = BrokerageStatementPdf(generate_statement(rows, pages))
+    # Decode and load the boxes once, only the factory is timed
+    brokerage_statement_factory([pdf_statement])
+
+    validated = rows_per_sec(pdf_statement, True, repeat)
+    trusted = rows_per_sec(pdf_statement, False, repeat)
+    click.echo(f"{rows} rows, {pages} page(s)")
+    click.echo(f"  validated {validated:>12,.0f} rows/sec")
+    click.echo(f"  trusted   {trusted:>12,.0f} rows/sec ({trusted / validated:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import contextlib
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from benchmarks.memory import peak_rss_mib
+from benchmarks.startup import import_times, measure_startup
+from benchmarks.synthetic import generate_statement
+from brokerage_statement import __version__, profiling
+from brokerage_statement.factory import brokerage_statement_factory
+from brokerage_statement.pdf.models import BrokerageStatementPdf
+from brokerage_statement.report.console import calculate_brokerage_statement
+
+STAGES = (
+    "decode",
+    "title_search",
+    "box_filtering",
+    "line_breaks",
+    "table_rows",
+    "factory",
+    "report",
+)
+
+
+class BenchmarkParams(BaseModel):
+    docs: int
+    rows: int
+    pages: int
+    trailing_pages: int
+
+
+class BenchmarkResult(BaseModel):
+    timestamp: datetime
+    version: str
+    params: BenchmarkParams
+    # Milliseconds per document
+    stages: dict[str, float]
+    total: float
+    docs_per_sec: float
+    peak_memory_mib: float
+    # Whole CLI process, reading the documents from files
+    peak_rss_mib: float = 0.0
+    # `--help` cold start, wall time and time spent importing modules
+    startup_ms: float = 0.0
+    startup_import_ms: float = 0.0
+
+
+def _process(pdf_file: bytes) -> None:
+    pdf_statement = BrokerageStatementPdf(pdf_file)
+    brokerage_statement = brokerage_statement_factory([pdf_statement])
+    with contextlib.redirect_stdout(io.StringIO()):
+        calculate_brokerage_statement(brokerage_statement)
+
+
+def run_benchmark(params: BenchmarkParams, repeat: int = 3) -> BenchmarkResult:
+    """Parse, build and report `params.docs` synthetic statements.
+
+    Stage timings are the best of `repeat` runs; the peak memory is measured
+    by tracemalloc on a separate run, as tracing slows everything down. The
+    peak RSS is the CLI's, exporting all the documents written to files.
+    """
+    pdf_files = [
+        generate_statement(
+            rows=params.rows,
+            pages=params.pages,
+            trailing_pages=params.trailing_pages,
+            seed=seed,
+        )
+        for seed in range(params.docs)
+    ]
+    # Warm up imports and caches
+    _process(pdf_files[0])
+
+    best: profiling.Profile | None = None
+    best_total = float("inf")
+    for _ in range(repeat):
+        with profiling.profile() as profile:
+            start = time.perf_counter()
+            for pdf_file in pdf_files:
+                _process(pdf_file)
+            total = time.perf_counter() - start
+        if total < best_total:
+            best, best_total = profile, total
+
+    assert best
+    tracemalloc.start()
+    try:
+        for pdf_file in pdf_files:
+            _process(pdf_file)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    with tempfile.TemporaryDirectory() as pdf_dir:
+        pdf_paths = []
+        for seed, pdf_file in enumerate(pdf_files):
+            pdf_paths.append(os.path.join(pdf_dir, f"{seed}.pdf"))
+            with open(pdf_paths[-1], "wb") as file:
+                file.write(pdf_file)
+        peak_rss = peak_rss_mib(
+            ("--no-cache", "--export", "jsonl", "-o", os.devnull, *pdf_paths)
+        )
+
+    startup = measure_startup(repeat=repeat)
+    startup_import = sum(import_times().values()) / 1000
+
+    def per_doc(seconds: float) -> float:
+        return round(seconds / params.docs * 1000, 3)
+
+    return BenchmarkResult(
+        timestamp=datetime.now(),
+        version=__version__,
+        params=params,
+        stages={stage: per_doc(best.stages.get(stage, 0.0)) for stage in STAGES},
+        total=per_doc(best_total),
+        docs_per_sec=round(params.docs / best_total, 2),
+        peak_memory_mib=round(peak / 1024 / 1024, 2),
+        peak_rss_mib=round(peak_rss, 2),
+        startup_ms=round(startup * 1000, 3),
+        startup_import_ms=round(startup_import, 3),
+    )
+
+
+def load_history(history_file: Path) -> list[BenchmarkResult]:
+    if not history_file.exists():
+        return []
+    with history_file.open(encoding="utf-8") as file:
+        return [BenchmarkResult.parse_raw(line) for line in file if line.strip()]
+
+
+def save_result(history_file: Path, result: BenchmarkResult) -> None:
+    history_file.parent.mkdir(parents=True, exist_ok=True)
+    with history_file.open("a", encoding="utf-8") as file:
+        file.write(result.json() + "\n")
+
+
+def find_regressions(
+    result: BenchmarkResult, history: list[BenchmarkResult], tolerance: float
+) -> list[str]:
+    """Compare with the last run of the same params in `history`"""
+    previous = next(
+        (old for old in reversed(history) if old.params == result.params), None
+    )
+    if previous is None:
+        return []
+
+    current = {**result.stages, "total": result.total}
+    baseline = {**previous.stages, "total": previous.total}
+    for name in ("peak_memory_mib", "peak_rss_mib", "startup_ms", "startup_import_ms"):
+        current[name] = getattr(result, name)
+        baseline[name] = getattr(previous, name)
+
+    return [
+        f"{name}: {baseline[name]:.3f} -> {value:.3f}"
+        for name, value in current.items()
+        if baseline.get(name) and value > baseline[name] * (1 + tolerance)
+    ]
+
+
+def format_result(result: BenchmarkResult) -> str:
+    lines = [
+        f"{result.params.docs} docs, {result.params.rows} rows, "
+        f"{result.params.pages} page(s) + {result.params.trailing_pages} trailing",
+        *(f"  {stage:<15}{ms:>10.3f} ms/doc" for stage, ms in result.stages.items()),
+        f"  {'total':<15}{result.total:>10.3f} ms/doc",
+        f"  {result.docs_per_sec:.2f} docs/sec, "
+        f"peak memory {result.peak_memory_mib:.2f} MiB, "
+        f"CLI peak RSS {result.peak_rss_mib:.2f} MiB",
+        f"  startup {result.startup_ms:.1f} ms, "
+        f"{result.startup_import_ms:.1f} ms of imports",
+    ]
+    return "\n".join(lines)
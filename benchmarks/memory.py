@@ -0,0 +1,22 @@
+"""Peak resident memory (RSS) of the CLI, measured on its own process"""
+import os
+import subprocess
+import sys
+
+from benchmarks.startup import COMMAND
+
+
+def peak_rss_mib(args: tuple[str, ...]) -> float:
+    """Peak RSS, in MiB, of running the CLI with `args`"""
+    process = subprocess.Popen(
+        (*COMMAND, *args), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    # Resource usage of this child only, unlike RUSAGE_CHILDREN
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, process.args)
+
+    # Kibibytes on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return usage.ru_maxrss / scale
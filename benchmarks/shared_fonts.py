@@ -0,0 +1,63 @@
+"""Statements/sec of a batch with and without shared pdfminer resources.
+
+    python -m benchmarks.shared_fonts --docs 1 --docs 100 --docs 1000
+
+Every statement of a batch has its own rows but the same font, as the
+statements of one broker. The font is either the bare standard Courier or,
+with font data, one with its own widths and ToUnicode CMap to decode.
+"""
+import contextlib
+import time
+
+import click
+
+from benchmarks.synthetic import generate_statement
+from brokerage_statement.factory import brokerage_statement_factory
+from brokerage_statement.pdf.models import BrokerageStatementPdf
+from brokerage_statement.pdf.resources import shared_resources
+
+
+def statements_per_sec(pdf_files: list[bytes], share_fonts: bool, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        with contextlib.ExitStack() as stack:
+            if share_fonts:
+                # Starts from an empty cache, as a new worker process
+                stack.enter_context(shared_resources()).clear()
+
+            start = time.perf_counter()
+            for pdf_file in pdf_files:
+                brokerage_statement_factory([BrokerageStatementPdf(pdf_file)])
+            best = min(best, time.perf_counter() - start)
+    return len(pdf_files) / best
+
+
+@click.command()
+@click.option(
+    "--docs",
+    multiple=True,
+    type=int,
+    default=(1, 100, 1000),
+    show_default=True,
+    help="Statements per batch, can be repeated.",
+)
+@click.option("--rows", default=24, show_default=True, help="Rows per statement.")
+@click.option("--repeat", default=3, show_default=True, help="Runs, keeps the best.")
+def main(docs: tuple[int, ...], rows: int, repeat: int):
+    for font_data in (False, True):
+        click.echo("font with widths and ToUnicode" if font_data else "standard font")
+        for count in docs:
+            pdf_files = [
+                generate_statement(rows, seed=seed, font_data=font_data)
+                for seed in range(count)
+            ]
+            own = statements_per_sec(pdf_files, False, repeat)
+            shared = statements_per_sec(pdf_files, True, repeat)
+            click.echo(
+                f"  {count:>5} statement(s)  own {own:>8,.1f}/sec"
+                f"  shared {shared:>8,.1f}/sec ({shared / own:.2f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Cold start time of the CLI, as in `python -X importtime`"""
+import subprocess
+import sys
+import time
+
+COMMAND = (sys.executable, "-m", "brokerage_statement")
+
+
+def measure_startup(args: tuple[str, ...] = ("--help",), repeat: int = 5) -> float:
+    """Best wall time, in seconds, of running the CLI with `args`"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run((*COMMAND, *args), capture_output=True, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def import_times(args: tuple[str, ...] = ("--help",)) -> dict[str, int]:
+    """Self import time, in microseconds, of each module the CLI imports"""
+    completed = subprocess.run(
+        (sys.executable, "-X", "importtime", *COMMAND[1:], *args),
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+
+    times: dict[str, int] = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, _, module = line.removeprefix("import time:").split("|")
+        if self_us.strip().isdigit():
+            times[module.strip()] = int(self_us)
+    return times
@@ -0,0 +1,239 @@
+"""Synthetic brokerage statements, written as plain PDF without extra deps.
+
+The layout mimics a "nota de corretagem": every page has the statement date
+and the securities table header, the rows are split over the pages and the
+business and financial summaries are on the last page. All titles are the
+ones `BrokerageStatementPdf` looks for, and the amounts reconcile, so the
+generated files go through the whole factory and report.
+"""
+import random
+from decimal import Decimal
+
+FONT_SIZE = 7.0
+# Courier: every glyph is 600/1000 em wide
+CHAR_WIDTH = FONT_SIZE * 0.6
+ROW_PITCH = 9.0
+TABLE_TOP = 700.0
+# Rows that fit in the securities TextBoxes (35 * char_height below the title)
+MAX_ROWS_PER_PAGE = 26
+TICKERS = (
+    "PETR4",
+    "VALE3",
+    "ITUB4",
+    "BBDC4",
+    "ABEV3",
+    "WEGE3",
+    "BBAS3",
+    "MGLU3",
+    "BOVA11",
+    "SUZB3",
+    "RENT3",
+    "LREN3",
+)
+
+
+class _Page:
+    def __init__(self) -> None:
+        self.operators: list[bytes] = []
+
+    def text(self, x: float, y: float, text: str) -> None:
+        raw = (
+            text.encode("cp1252")
+            .replace(b"\\", b"\\\\")
+            .replace(b"(", b"\\(")
+            .replace(b")", b"\\)")
+        )
+        self.operators.append(
+            b"BT /F1 %g Tf %.2f %.2f Td (%s) Tj ET" % (FONT_SIZE, x, y, raw)
+        )
+
+    def text_right(self, right: float, y: float, text: str) -> None:
+        self.text(right - len(text) * CHAR_WIDTH, y, text)
+
+    def content(self) -> bytes:
+        return b"\n".join(self.operators)
+
+
+def generate_statement(
+    rows: int = 10,
+    pages: int = 1,
+    trailing_pages: int = 0,
+    seed: int = 0,
+    font_data: bool = False,
+) -> bytes:
+    """A statement with `rows` operations split over `pages` pages.
+
+    `trailing_pages` pages of plain text (e.g. terms and conditions) are
+    appended after the statement itself. With `font_data`, the font carries
+    its own widths and ToUnicode CMap, as the fonts embedded by brokers do.
+    """
+    rows_per_page = max(1, -(-rows // pages))
+    if rows_per_page > MAX_ROWS_PER_PAGE:
+        raise ValueError(
+            f"{rows} rows do not fit in {pages} page(s), "
+            f"at most {MAX_ROWS_PER_PAGE} rows per page"
+        )
+
+    rnd = random.Random(seed)
+    items = []
+    for _ in range(rows):
+        amount = rnd.randint(1, 500)
+        price = Decimal(rnd.randint(100, 20000)) / 100
+        operation_type = rnd.choice("CV")
+        items.append((rnd.choice(TICKERS), amount, price, operation_type))
+
+    sold = sum((a * p for _, a, p, op in items if op == "V"), Decimal(0))
+    bought = sum((a * p for _, a, p, op in items if op == "C"), Decimal(0))
+    settlement_fee = ((sold + bought) * Decimal("0.00025")).quantize(Decimal("0.01"))
+    exchange_fees = ((sold + bought) * Decimal("0.00005")).quantize(Decimal("0.01"))
+
+    pages_content = []
+    for page_idx in range(pages):
+        page = _Page()
+        page.text(40, 800, "NOTA DE NEGOCIAÇÃO")
+        page.text(40, 780, f"Nr. nota {100000 + seed}   Folha {page_idx + 1}")
+        page.text(400, 780, "Data pregão: 05/12/2022")
+        page.text(40, 720, "Negócios realizados")
+
+        y = TABLE_TOP
+        page.text(40, y, "C/V")
+        page.text(70, y, "Especificação do Título")
+        page.text(180, y, "Quantidade")
+        page.text(235, y, "Preço Liquidação (R$)")
+        page.text(340, y, "Compra/Venda (R$)")
+
+        page_items = items[page_idx * rows_per_page : (page_idx + 1) * rows_per_page]
+        for ticker, amount, price, operation_type in page_items:
+            y -= ROW_PITCH
+            page.text(44.2, y, operation_type)
+            page.text(70, y, f"{ticker} ON NM")
+            page.text_right(222, y, _format(Decimal(amount), 0))
+            page.text_right(323.2, y, _format(price))
+            page.text_right(411.4, y, _format(amount * price))
+
+        if page_idx == pages - 1:
+            _draw_summaries(page, sold, bought, settlement_fee, exchange_fees)
+
+        pages_content.append(page.content())
+
+    for page_idx in range(trailing_pages):
+        page = _Page()
+        for line in range(60):
+            page.text(40, 800 - line * 12, f"Condições gerais {page_idx}.{line}")
+        pages_content.append(page.content())
+
+    return _build_pdf(pages_content, font_data)
+
+
+def _draw_summaries(
+    page: _Page,
+    sold: Decimal,
+    bought: Decimal,
+    settlement_fee: Decimal,
+    exchange_fees: Decimal,
+) -> None:
+    business_summary = [
+        ("Debêntures", Decimal(0)),
+        ("Vendas à vista", sold),
+        ("Compras à vista", bought),
+        ("Opções - compras", Decimal(0)),
+        ("Opções - vendas", Decimal(0)),
+        ("Operações à termo", Decimal(0)),
+        ("Valor das oper. c/ títulos", Decimal(0)),
+        ("Valor das Operações", sold + bought),
+    ]
+    for line, (label, value) in enumerate(business_summary):
+        page.text(40, 300 - line * 10, label)
+        page.text_right(320, 300 - line * 10, _format(value))
+
+    net_value = sold - bought
+    financial_summary = [
+        ("Valor Líquido das Operações(1)", net_value),
+        ("Taxa de Liquidação(2)", -settlement_fee),
+        ("Taxa de Registro(3)", Decimal(0)),
+        ("Emolumentos", -exchange_fees),
+        ("Corretagem", Decimal(0)),
+        ("ISS", Decimal(0)),
+        ("Outras", Decimal(0)),
+        ("Liquido para 07/12/2022", net_value - settlement_fee - exchange_fees),
+    ]
+    for line, (label, value) in enumerate(financial_summary):
+        debit_credit = "D" if value < 0 else "C"
+        page.text(360, 300 - line * 10, label)
+        page.text_right(588, 300 - line * 10, f"{_format(abs(value))} {debit_credit}")
+
+
+def _format(value: Decimal, places: int = 2) -> str:
+    """Brazilian number format, e.g. 1.234,56"""
+    formatted = f"{value:,.{places}f}"
+    return formatted.replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def _to_unicode_cmap() -> bytes:
+    """ToUnicode CMap of the WinAnsi codes, in blocks of 100 as the spec asks"""
+    chars: list[tuple[int, str]] = []
+    for code in range(32, 256):
+        try:
+            chars.append((code, bytes([code]).decode("cp1252")))
+        except UnicodeDecodeError:
+            # Undefined in WinAnsi
+            continue
+
+    lines = [
+        b"/CIDInit /ProcSet findresource begin 12 dict begin begincmap",
+        b"/CMapName /Synthetic-UCS def /CMapType 2 def",
+        b"1 begincodespacerange <00> <FF> endcodespacerange",
+    ]
+    for start in range(0, len(chars), 100):
+        block = chars[start : start + 100]
+        lines.append(b"%d beginbfchar" % len(block))
+        for code, char in block:
+            lines.append(b"<%02X> <%04X>" % (code, ord(char)))
+        lines.append(b"endbfchar")
+    lines.append(b"endcmap CMapName currentdict /CMap defineresource pop end end")
+    return b"\n".join(lines)
+
+
+def _build_pdf(pages_content: list[bytes], font_data: bool = False) -> bytes:
+    page_ids = [4 + 2 * idx for idx in range(len(pages_content))]
+    font = b"/Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding"
+    if font_data:
+        to_unicode_id = 4 + 2 * len(pages_content)
+        font += b" /FirstChar 32 /LastChar 255 /Widths [%s] /ToUnicode %d 0 R" % (
+            b" ".join([b"600"] * 224),
+            to_unicode_id,
+        )
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (b" ".join(b"%d 0 R" % page_id for page_id in page_ids), len(page_ids)),
+        b"<< %s >>" % font,
+    ]
+    for page_id, content in zip(page_ids, pages_content):
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842]"
+            b" /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (page_id + 1)
+        )
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content)
+        )
+    if font_data:
+        cmap = _to_unicode_cmap()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(cmap), cmap))
+
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for object_id, obj in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (object_id, obj)
+
+    xref_offset = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        pdf += b"%010d 00000 n \n" % offset
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref_offset,
+    )
+    return bytes(pdf)
@@ -1,20 +1,345 @@
-import io
+import contextlib
+import sys
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Iterator
 
 import click
 
-from brokerage_statement.factory import brokerage_statement_factory
-from brokerage_statement.pdf.models import BrokerageStatementPdf
-from brokerage_statement.report.console import calculate_brokerage_statement
+# The parser, pdfminer and pydantic are imported by the functions that need
+# them, so --help, usage errors and cached runs start fast.
+if TYPE_CHECKING:
+    from brokerage_statement.aggregate import StatementAggregator
+    from brokerage_statement.batch import BatchResult
+    from brokerage_statement.cache import StatementCache
+    from brokerage_statement.export import Exporter
+    from brokerage_statement.models import BrokerageStatement
+    from brokerage_statement.profiling import Profile, ProfileReport
+    from brokerage_statement.watch import DirectoryWatcher
 
 # FIXME:  Fix rule for ISS and Taxa de Corretagem (2022.12.05.pdf)
 
 
+def _default_cache_dir() -> Path:
+    from brokerage_statement.cache import default_cache_dir
+
+    return default_cache_dir()
+
+
 @click.command()
-@click.argument("pdf_files", nargs=-1, type=click.File("rb"))
-def main(pdf_files: list[io.BufferedReader]):
-    pdf_statements = [BrokerageStatementPdf(file.read()) for file in pdf_files]
-    brokerage_statement = brokerage_statement_factory(pdf_statements)
-    calculate_brokerage_statement(brokerage_statement)
+@click.argument("pdf_files", nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Batch mode: report each file on its own, using N worker processes.",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    default=_default_cache_dir,
+    show_default="~/.cache/brokerage-statement",
+    help="Where parsed statements are cached.",
+)
+@click.option("--no-cache", is_flag=True, help="Always parse the PDF files.")
+@click.option(
+    "--share-fonts",
+    is_flag=True,
+    help="Decode the fonts shared by the PDF files (e.g. from the same broker) "
+    "once per process, instead of once per file.",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Stop decoding each PDF file once the statement is found, skipping "
+    "the pages after it (e.g. terms and conditions).",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Print the time and counters of each stage, per file, as JSON to stderr.",
+)
+@click.option(
+    "--profile-output",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Write the --profile JSON to a file instead (implies --profile).",
+)
+@click.option(
+    "--watch",
+    "watch_dir",
+    type=click.Path(exists=True, file_okay=False),
+    default=None,
+    help="Watch mode: report each PDF file dropped in DIRECTORY as it shows up.",
+)
+@click.option(
+    "--interval",
+    type=click.FloatRange(min=0),
+    default=2.0,
+    show_default=True,
+    help="Seconds between scans of the --watch directory.",
+)
+@click.option(
+    "--state-file",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Journal of the files --watch already reported, so restarts resume "
+    "where they stopped (kept in the cache dir by default).",
+)
+@click.option(
+    "--export",
+    "export_format",
+    type=click.Choice(["csv", "jsonl", "columnar"]),
+    default=None,
+    help="Write the items of every statement, with their fees, instead of "
+    "the report.",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False, allow_dash=True),
+    default="-",
+    show_default=True,
+    help="Where --export writes to.",
+)
+@click.option(
+    "--store",
+    "store_path",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Ingest the files into this SQLite database instead of reporting "
+    "them; files already stored are skipped.",
+)
+@click.pass_context
+def main(
+    ctx: click.Context,
+    pdf_files: tuple[str, ...],
+    jobs: int | None,
+    cache_dir: str,
+    no_cache: bool,
+    share_fonts: bool,
+    stream: bool,
+    profile: bool,
+    profile_output: str | None,
+    watch_dir: str | None,
+    interval: float,
+    state_file: str | None,
+    export_format: str | None,
+    output: str,
+    store_path: str | None,
+):
+    from brokerage_statement.cache import StatementCache
+    from brokerage_statement.profiling import ProfileReport
+
+    if watch_dir is not None and pdf_files:
+        raise click.UsageError("PDF_FILES can not be used with --watch.")
+
+    cache = None if no_cache else StatementCache(cache_dir)
+    profile = profile or profile_output is not None
+    report = ProfileReport() if profile else None
+
+    try:
+        exporter = _exporter(ctx, export_format, output)
+        if store_path is not None:
+            _ingest(ctx, pdf_files, store_path, jobs or 1, cache, share_fonts, stream)
+        elif watch_dir is not None:
+            from brokerage_statement.watch import DirectoryWatcher, default_state_file
+
+            watcher = DirectoryWatcher(
+                watch_dir,
+                state_file or default_state_file(watch_dir, cache_dir),
+                jobs=jobs or 1,
+                cache=cache,
+                interval=interval,
+                profile=profile,
+                share_fonts=share_fonts,
+                stream=stream,
+            )
+            _watch(watcher, report, exporter)
+        else:
+            _report(ctx, pdf_files, jobs, cache, share_fonts, stream, report, exporter)
+    finally:
+        if report is not None:
+            _write_profile(report, profile_output)
+
+
+def _report(
+    ctx: click.Context,
+    pdf_files: tuple[str, ...],
+    jobs: int | None,
+    cache: "StatementCache | None",
+    share_fonts: bool,
+    stream: bool,
+    report: "ProfileReport | None",
+    exporter: "Exporter | None",
+):
+    from brokerage_statement.aggregate import StatementAggregator
+    from brokerage_statement.batch import load_statement, parse_batch
+    from brokerage_statement.profiling import Profile
+
+    # Statements are reported one at a time, only their totals are kept
+    aggregator = StatementAggregator()
+    if jobs is not None:
+        failures = 0
+        results = parse_batch(
+            pdf_files, jobs, cache, report is not None, share_fonts, stream
+        )
+        for result in results:
+            if _echo_result(result, report, exporter):
+                assert result.statement
+                aggregator.add(result.statement, result.pdf_path)
+            else:
+                failures += 1
+
+        _print_totals(aggregator, exporter)
+        if failures:
+            click.echo(f"{failures} of {len(pdf_files)} file(s) failed", err=True)
+            ctx.exit(1)
+        return
+
+    for pdf_path in pdf_files:
+        profile = None if report is None else Profile(documents=1)
+        try:
+            with _profiled(profile):
+                brokerage_statement = load_statement(
+                    pdf_path, cache, share_fonts, stream
+                )
+                _output(brokerage_statement, pdf_path, exporter)
+        finally:
+            if report is not None:
+                assert profile
+                report.add(pdf_path, profile)
+
+        aggregator.add(brokerage_statement, pdf_path)
+
+    _print_totals(aggregator, exporter)
+
+
+def _ingest(
+    ctx: click.Context,
+    pdf_files: tuple[str, ...],
+    store_path: str,
+    jobs: int,
+    cache: "StatementCache | None",
+    share_fonts: bool,
+    stream: bool,
+):
+    from brokerage_statement.store import StatementStore
+
+    with StatementStore(store_path) as store:
+        summary = store.ingest(pdf_files, jobs, cache, share_fonts, stream)
+
+    for result in summary.failures:
+        click.echo(f"{result.pdf_path}: {result.error}", err=True)
+    click.echo(
+        f"{summary.added} statement(s) added, {summary.skipped} already stored, "
+        f"{len(summary.failures)} failed"
+    )
+    if summary.failures:
+        ctx.exit(1)
+
+
+def _watch(
+    watcher: "DirectoryWatcher",
+    report: "ProfileReport | None",
+    exporter: "Exporter | None",
+):
+    try:
+        for result in watcher.run():
+            _echo_result(result, report, exporter)
+            if exporter is not None:
+                # Downstream jobs read the export as it grows
+                exporter.file.flush()
+    except KeyboardInterrupt:
+        pass
+
+
+def _echo_result(
+    result: "BatchResult",
+    report: "ProfileReport | None",
+    exporter: "Exporter | None",
+) -> bool:
+    """Report a statement of the batch, returns whether it was parsed"""
+    if result.failed:
+        click.echo(f"{result.pdf_path}: {result.error}", err=True)
+    else:
+        assert result.statement
+        if exporter is None:
+            click.echo(result.pdf_path)
+        with _profiled(result.profile):
+            _output(result.statement, result.pdf_path, exporter)
+
+    if report is not None:
+        assert result.profile
+        report.add(result.pdf_path, result.profile)
+
+    return not result.failed
+
+
+def _output(
+    brokerage_statement: "BrokerageStatement",
+    source: str,
+    exporter: "Exporter | None",
+) -> None:
+    from brokerage_statement.report.console import calculate_brokerage_statement
+
+    if exporter is None:
+        calculate_brokerage_statement(brokerage_statement)
+    else:
+        exporter.write_statement(brokerage_statement, source)
+
+
+def _print_totals(
+    aggregator: "StatementAggregator", exporter: "Exporter | None"
+) -> None:
+    """Per date and overall totals, after the reports of several statements"""
+    if exporter is not None or aggregator.total.statements < 2:
+        return
+
+    from brokerage_statement.report.console import print_totals
+
+    print_totals(aggregator)
+
+
+def _exporter(
+    ctx: click.Context, export_format: str | None, output: str
+) -> "Exporter | None":
+    if export_format is None:
+        return None
+
+    from brokerage_statement.export import EXPORTERS
+
+    exporter_class = EXPORTERS[export_format]
+    file: IO
+    if output == "-":
+        file = sys.stdout.buffer if exporter_class.binary else sys.stdout
+    elif exporter_class.binary:
+        file = ctx.with_resource(open(output, "wb"))
+    else:
+        file = ctx.with_resource(open(output, "w", encoding="utf-8", newline=""))
+
+    return exporter_class(file)
+
+
+@contextlib.contextmanager
+def _profiled(profile: "Profile | None") -> Iterator[None]:
+    if profile is None:
+        yield
+        return
+
+    from brokerage_statement import profiling
+
+    with profiling.profile(profile):
+        yield
+
+
+def _write_profile(report: "ProfileReport", profile_output: str | None) -> None:
+    if profile_output is None:
+        click.echo(report.json(indent=2), err=True)
+        return
+
+    with open(profile_output, "w", encoding="utf-8") as file:
+        file.write(report.json(indent=2))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+"""Totals over any number of statements, computed as they stream in.
+
+Each statement is reduced to a `StatementSummary` as soon as it is added, so
+only the totals are kept: one per statement date, and the overall one. The
+memory used depends on the number of dates, not on the number of statements.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Iterator
+
+from pydantic import BaseModel
+
+from brokerage_statement.models import BrokerageStatement, OperationType
+
+
+class StatementSummary(BaseModel):
+    source: str | None = None
+    statement_date: datetime
+    items: int
+    sold: Decimal
+    bought: Decimal
+    operations_total_amount: Decimal
+    settlement_fee: Decimal
+    exchange_fees: Decimal
+    tax_over_service: Decimal
+    brokerage_fee: Decimal
+    net_price: Decimal
+
+    @property
+    def reconciled(self) -> bool:
+        """Whether the items add up to the statement's operations total"""
+        return self.operations_total_amount == abs(self.sold) + abs(self.bought)
+
+
+class StatementTotals(BaseModel):
+    statements: int = 0
+    # Statements whose items do not add up to their operations total
+    unreconciled: int = 0
+    items: int = 0
+    sold: Decimal = Decimal(0)
+    bought: Decimal = Decimal(0)
+    operations_total_amount: Decimal = Decimal(0)
+    settlement_fee: Decimal = Decimal(0)
+    exchange_fees: Decimal = Decimal(0)
+    tax_over_service: Decimal = Decimal(0)
+    brokerage_fee: Decimal = Decimal(0)
+    net_price: Decimal = Decimal(0)
+
+    def add(self, summary: StatementSummary) -> None:
+        self.statements += 1
+        self.unreconciled += not summary.reconciled
+        self.items += summary.items
+        self.sold += summary.sold
+        self.bought += summary.bought
+        self.operations_total_amount += summary.operations_total_amount
+        self.settlement_fee += summary.settlement_fee
+        self.exchange_fees += summary.exchange_fees
+        self.tax_over_service += summary.tax_over_service
+        self.brokerage_fee += summary.brokerage_fee
+        self.net_price += summary.net_price
+
+
+def summarize(
+    statement: BrokerageStatement, source: str | None = None
+) -> StatementSummary:
+    sold = Decimal(0)
+    bought = Decimal(0)
+    for item in statement.items:
+        if item.operation_type == OperationType.SELL:
+            sold += item.total_price
+        elif item.operation_type == OperationType.BUY:
+            bought += item.total_price
+
+    summary = statement.financial_summary
+    # Every value comes from an already built statement
+    return StatementSummary.construct(
+        source=source,
+        statement_date=statement.statement_date,
+        items=len(statement.items),
+        sold=sold,
+        bought=bought,
+        operations_total_amount=statement.business_summary.operations_total_amount,
+        settlement_fee=summary.settlement_fee,
+        exchange_fees=summary.exchange_fees,
+        tax_over_service=summary.tax_over_service,
+        brokerage_fee=summary.brokerage_fee,
+        net_price=statement.net_price,
+    )
+
+
+class StatementAggregator:
+    """Per date and overall totals of the statements added to it"""
+
+    def __init__(self) -> None:
+        self.total = StatementTotals()
+        self._dates: dict[date, StatementTotals] = {}
+
+    def add(
+        self, statement: BrokerageStatement, source: str | None = None
+    ) -> StatementSummary:
+        summary = summarize(statement, source)
+        statement_date = summary.statement_date.date()
+        if statement_date not in self._dates:
+            self._dates[statement_date] = StatementTotals()
+
+        self._dates[statement_date].add(summary)
+        self.total.add(summary)
+        return summary
+
+    def consume(
+        self, statements: Iterable[BrokerageStatement]
+    ) -> Iterator[StatementSummary]:
+        """Add each statement as it is read, yielding its summary"""
+        for statement in statements:
+            yield self.add(statement)
+
+    def dates(self) -> list[tuple[date, StatementTotals]]:
+        """Totals of each statement date, in chronological order"""
+        return sorted(self._dates.items())
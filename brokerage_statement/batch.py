@@ -0,0 +1,113 @@
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Iterable, Iterator
+
+from pydantic import BaseModel
+
+from brokerage_statement import profiling
+from brokerage_statement.cache import StatementCache
+from brokerage_statement.models import BrokerageStatement
+from brokerage_statement.source import contents, open_pdf
+
+
+class BatchResult(BaseModel):
+    pdf_path: str
+    statement: BrokerageStatement | None = None
+    error: str | None = None
+    profile: profiling.Profile | None = None
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+
+def load_statement(
+    pdf_path: str,
+    cache: StatementCache | None = None,
+    share_fonts: bool = False,
+    stream: bool = False,
+) -> BrokerageStatement:
+    """Parse a single PDF file into its own BrokerageStatement.
+
+    With `share_fonts`, the fonts decoded for previous files in this process
+    are reused (see `brokerage_statement.pdf.resources`). With `stream`, the
+    pages after the statement (e.g. terms and conditions) are not decoded
+    (see `PDFDocument`).
+    """
+    with open_pdf(pdf_path) as pdf_file:
+        if cache is not None:
+            key = cache.key(contents(pdf_file))
+            if statement := cache.get(key):
+                profiling.count("cache_hits")
+                return statement
+
+        # pdfminer is only imported when there is a PDF to decode
+        from brokerage_statement.factory import brokerage_statement_factory
+        from brokerage_statement.pdf.models import BrokerageStatementPdf
+        from brokerage_statement.pdf.resources import shared_resources
+
+        with contextlib.ExitStack() as stack:
+            if share_fonts:
+                stack.enter_context(shared_resources())
+            pdf_statement = BrokerageStatementPdf(pdf_file, stream=stream)
+        statement = brokerage_statement_factory([pdf_statement])
+
+    if cache is not None:
+        cache.put(key, statement)
+
+    return statement
+
+
+def parse_statement_file(
+    pdf_path: str,
+    cache: StatementCache | None = None,
+    profile: bool = False,
+    share_fonts: bool = False,
+    stream: bool = False,
+) -> BatchResult:
+    """Same as `load_statement`, but failures are returned instead of raised,
+    so one bad statement does not stop the whole batch.
+
+    With `profile`, the result carries the profile of the parsing, which is
+    collected in the process doing it.
+    """
+    result = BatchResult(pdf_path=pdf_path)
+    with contextlib.ExitStack() as stack:
+        if profile:
+            result.profile = stack.enter_context(profiling.profile())
+        try:
+            result.statement = load_statement(pdf_path, cache, share_fonts, stream)
+        except Exception as exc:
+            result.error = f"{type(exc).__name__}: {exc}"
+
+    return result
+
+
+def parse_batch(
+    pdf_paths: Iterable[str],
+    jobs: int = 1,
+    cache: StatementCache | None = None,
+    profile: bool = False,
+    share_fonts: bool = False,
+    stream: bool = False,
+) -> Iterator[BatchResult]:
+    """Parse the PDF files using `jobs` worker processes.
+
+    Results are yielded in the same order as `pdf_paths`. With `share_fonts`,
+    each worker reuses the fonts it decoded for the previous files.
+    """
+    parse = partial(
+        parse_statement_file,
+        cache=cache,
+        profile=profile,
+        share_fonts=share_fonts,
+        stream=stream,
+    )
+
+    if jobs <= 1:
+        yield from map(parse, pdf_paths)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(parse, pdf_paths)
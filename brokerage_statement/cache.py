@@ -0,0 +1,125 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import pdfminer
+
+from brokerage_statement import __version__
+from brokerage_statement.models import BrokerageStatement
+from brokerage_statement.serialization import json_encoder
+from brokerage_statement.source import Buffer
+
+# Bump whenever a change in the parser can change the parsed statements
+PARSER_VERSION = "5"
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+# Total size of the entries, in the cache directory
+SIZE_FILE = "size"
+
+
+def default_cache_dir() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "brokerage-statement"
+
+
+class StatementCache:
+    """Content addressed on-disk cache of parsed statements.
+
+    Entries are keyed by a hash of the PDF bytes plus the parser and pdfminer
+    versions, and hold the statement serialized as JSON. Writes go through a
+    temporary file renamed into place, so worker processes sharing the
+    directory never see partial entries. Reads refresh the entry's mtime,
+    which `evict` uses to drop the least recently used entries.
+
+    The total size of the entries is kept in the `SIZE_FILE` of the
+    directory, so the entries are only listed once a `put` takes it over
+    `max_size`. Processes writing at the same time may miss each other's
+    entries in the total, it is made exact again whenever entries are
+    evicted.
+    """
+
+    def __init__(self, cache_dir: Path | str, max_size: int = DEFAULT_MAX_SIZE):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+
+    @staticmethod
+    def key(pdf_file: Buffer) -> str:
+        digest = hashlib.sha256(
+            f"{PARSER_VERSION}:{__version__}:{pdfminer.__version__}".encode()
+        )
+        digest.update(b"\0")
+        digest.update(pdf_file)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> BrokerageStatement | None:
+        entry_path = self._entry_path(key)
+        try:
+            statement = BrokerageStatement.parse_file(entry_path)
+            os.utime(entry_path)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # Unreadable entry, e.g. written by an incompatible version
+            entry_path.unlink(missing_ok=True)
+            return None
+
+        return statement
+
+    def put(self, key: str, statement: BrokerageStatement) -> None:
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+
+        data = statement.json(encoder=json_encoder).encode()
+        _write_file(entry_path, data)
+
+        total_size = self._read_total_size()
+        if total_size is None or total_size + len(data) > self.max_size:
+            self.evict()
+        else:
+            _write_file(self.cache_dir / SIZE_FILE, b"%d" % (total_size + len(data)))
+
+    def _read_total_size(self) -> int | None:
+        try:
+            return int((self.cache_dir / SIZE_FILE).read_bytes())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def evict(self) -> None:
+        """Remove the least recently used entries beyond `max_size`.
+
+        Lists every entry, `put` calls it when the total size goes over.
+        """
+        entries: list[tuple[float, int, Path]] = []
+        for entry_path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = entry_path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            # Another process may have evicted it already
+            entry_path.unlink(missing_ok=True)
+            total_size -= size
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        _write_file(self.cache_dir / SIZE_FILE, b"%d" % total_size)
+
+
+def _write_file(path: Path, data: bytes) -> None:
+    """Write through a temporary file renamed into place"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
@@ -0,0 +1,236 @@
+"""Export of the statement items, one row per item.
+
+Exporters write one statement at a time, so a batch of any size is exported
+in constant memory. Besides the item itself, each row carries the statement
+date and net price and the fees apportioned to the item.
+
+The columnar format is a sequence of row groups, one per statement, after a
+JSON header with the schema. Each column of a group is either an array of
+little-endian int64 (integers, decimals and dates as days since 1970-01-01)
+or, for strings, uint32 offsets plus the UTF-8 blob. Decimals are scaled by
+10**scale, the scale (at least DECIMAL_SCALE) being the uint8 before them:
+the decimal places of each column are only known once its group is seen.
+`read_columnar` reads it back.
+"""
+import abc
+import csv
+import io
+import json
+import struct
+import sys
+from array import array
+from datetime import date, datetime
+from decimal import Decimal
+from typing import IO, Any, Iterator
+
+from brokerage_statement import serialization
+from brokerage_statement.models import BrokerageStatement
+from brokerage_statement.report.apportionment import apportion_fees
+
+# (name, type) of every exported column, in order
+COLUMNS: tuple[tuple[str, str], ...] = (
+    ("source", "string"),
+    ("statement_date", "date"),
+    ("operation_type", "string"),
+    ("security", "string"),
+    ("amount", "int64"),
+    ("unit_price", "decimal"),
+    ("total_price", "decimal"),
+    ("settlement_fee", "decimal"),
+    ("exchange_fees", "decimal"),
+    ("tax_over_service", "decimal"),
+    ("total_with_fees", "decimal"),
+    ("net_price", "decimal"),
+)
+
+COLUMNAR_MAGIC = b"BSTCOL2\n"
+# Least scale of the decimal columns, that of amounts in BRL
+DECIMAL_SCALE = 2
+
+EPOCH = date(1970, 1, 1)
+
+
+def statement_columns(
+    statement: BrokerageStatement, source: str | None = None
+) -> dict[str, list[Any]]:
+    """The rows of a statement, column by column"""
+    fees = apportion_fees([statement])
+    items = statement.items
+    rows = len(items)
+
+    return {
+        "source": [source or ""] * rows,
+        "statement_date": [statement.statement_date.date()] * rows,
+        "operation_type": [item.operation_type.value for item in items],
+        "security": [item.security for item in items],
+        "amount": [item.amount for item in items],
+        "unit_price": [item.unit_price for item in items],
+        "total_price": [item.total_price for item in items],
+        "settlement_fee": fees.settlement_fee,
+        "exchange_fees": fees.exchange_fees,
+        "tax_over_service": fees.tax_over_service,
+        "total_with_fees": fees.total_with_fees,
+        "net_price": [statement.net_price] * rows,
+    }
+
+
+class Exporter(abc.ABC):
+    """Writes the rows of each statement to `file` as soon as it is given"""
+
+    binary = False
+
+    def __init__(self, file: IO):
+        self.file = file
+        self.rows = 0
+
+    def write_statement(
+        self, statement: BrokerageStatement, source: str | None = None
+    ) -> None:
+        columns = statement_columns(statement, source)
+        self._write_columns(columns, len(statement.items))
+        self.rows += len(statement.items)
+
+    @abc.abstractmethod
+    def _write_columns(self, columns: dict[str, list[Any]], rows: int) -> None:
+        ...
+
+    def _iter_rows(self, columns: dict[str, list[Any]]) -> Iterator[tuple]:
+        return zip(*(columns[name] for name, _ in COLUMNS))
+
+
+class CsvExporter(Exporter):
+    def __init__(self, file: IO[str]):
+        super().__init__(file)
+        self._writer = csv.writer(file)
+        self._writer.writerow(name for name, _ in COLUMNS)
+
+    def _write_columns(self, columns: dict[str, list[Any]], rows: int) -> None:
+        self._writer.writerows(
+            [_to_text(value) for value in row] for row in self._iter_rows(columns)
+        )
+
+
+class JsonlExporter(Exporter):
+    def _write_columns(self, columns: dict[str, list[Any]], rows: int) -> None:
+        names = [name for name, _ in COLUMNS]
+        for row in self._iter_rows(columns):
+            record = dict(zip(names, row))
+            self.file.write(serialization.dumps(record, ensure_ascii=False) + "\n")
+
+
+class ColumnarExporter(Exporter):
+    binary = True
+
+    def __init__(self, file: IO[bytes]):
+        super().__init__(file)
+        schema = {"columns": [{"name": name, "type": kind} for name, kind in COLUMNS]}
+        header = json.dumps(schema).encode()
+        file.write(COLUMNAR_MAGIC + struct.pack("<I", len(header)) + header)
+
+    def _write_columns(self, columns: dict[str, list[Any]], rows: int) -> None:
+        if not rows:
+            return
+
+        group = io.BytesIO()
+        group.write(struct.pack("<I", rows))
+        for name, kind in COLUMNS:
+            values = columns[name]
+            if kind == "string":
+                blobs = [value.encode() for value in values]
+                offsets = array("I", [0])
+                for blob in blobs:
+                    offsets.append(offsets[-1] + len(blob))
+                group.write(_little_endian(offsets))
+                group.write(b"".join(blobs))
+            elif kind == "decimal":
+                scale = _decimal_scale(values)
+                integers = array("q", (int(value.scaleb(scale)) for value in values))
+                group.write(struct.pack("<B", scale))
+                group.write(_little_endian(integers))
+            else:
+                integers = array("q", map(_ENCODERS[kind], values))
+                group.write(_little_endian(integers))
+
+        self.file.write(group.getvalue())
+
+
+EXPORTERS: dict[str, type[Exporter]] = {
+    "csv": CsvExporter,
+    "jsonl": JsonlExporter,
+    "columnar": ColumnarExporter,
+}
+
+
+def read_columnar(file: IO[bytes]) -> Iterator[dict[str, list[Any]]]:
+    """Yield each row group (a statement) of a columnar export"""
+    if file.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar statement export")
+
+    (header_size,) = struct.unpack("<I", file.read(4))
+    schema = json.loads(file.read(header_size))
+
+    while rows_header := file.read(4):
+        (rows,) = struct.unpack("<I", rows_header)
+        group: dict[str, list[Any]] = {}
+        for column in schema["columns"]:
+            if column["type"] == "string":
+                offsets = _read_array(file, "I", rows + 1)
+                blob = file.read(offsets[-1])
+                group[column["name"]] = [
+                    blob[start:end].decode() for start, end in zip(offsets, offsets[1:])
+                ]
+                continue
+
+            if column["type"] == "decimal":
+                (scale,) = struct.unpack("<B", file.read(1))
+                integers = _read_array(file, "q", rows)
+                group[column["name"]] = [
+                    Decimal(value).scaleb(-scale) for value in integers
+                ]
+                continue
+
+            integers = _read_array(file, "q", rows)
+            if column["type"] == "date":
+                group[column["name"]] = [
+                    date.fromordinal(EPOCH.toordinal() + value) for value in integers
+                ]
+            else:
+                group[column["name"]] = list(integers)
+
+        yield group
+
+
+def _to_text(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _decimal_scale(values: list[Decimal]) -> int:
+    """Least scale that keeps every value exact"""
+    exponents = [value.as_tuple().exponent for value in values]
+    return max([DECIMAL_SCALE, *(-exponent for exponent in exponents)])
+
+
+def _encode_date(value: date) -> int:
+    return value.toordinal() - EPOCH.toordinal()
+
+
+_ENCODERS = {"int64": int, "date": _encode_date}
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _read_array(file: IO[bytes], typecode: str, length: int) -> array:
+    values = array(typecode)
+    values.frombytes(file.read(values.itemsize * length))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
@@ -1,7 +1,11 @@
 import re
 from decimal import Decimal
 from datetime import datetime
+from typing import Iterable, TypeVar
 
+from pydantic import BaseModel
+
+from brokerage_statement import profiling
 from brokerage_statement.pdf.models import BrokerageStatementPdf
 from brokerage_statement.models import (
     BrokerageStatement,
@@ -11,21 +15,64 @@ from brokerage_statement.models import (
     BusinessSummary,
 )
 
+Model = TypeVar("Model", bound=BaseModel)
+
+TICKER_RE = re.compile(r"[a-zA-Z]{4}[0-9]{1,2}")
+DECIMAL_SEPARATOR = ","
+NON_DECIMAL_RE = re.compile(rf"[^\d{DECIMAL_SEPARATOR}]")
+# Values of the financial summary end with C (credit) or D (debit)
+DEBIT_RE = re.compile(r"^\s*-|D\s*$")
 
+
+@profiling.timed("factory")
 def brokerage_statement_factory(
-    pdf_statements: list[BrokerageStatementPdf],
+    pdf_statements: Iterable[BrokerageStatementPdf],
+    validate: bool = False,
 ) -> BrokerageStatement:
-    items: list[StatementItem] = []
-    pdf_statement = pdf_statements[0]
+    """Build one statement out of its PDF files.
+
+    Every value is parsed into its field's type here, so by default the
+    models are built without pydantic's validation; `validate=True` runs it
+    anyway. The reconciliation checks run either way, on each file.
+
+    The PDF files are consumed one at a time, so an iterator keeps only one
+    of them in memory. When there are several, the items are concatenated
+    and the summaries and net prices added up; the date is the first one's.
+    """
+    statements = [build_statement(stm, validate) for stm in pdf_statements]
+    if len(statements) == 1:
+        return statements[0]
+
+    return _build(
+        BrokerageStatement,
+        validate,
+        statement_date=statements[0].statement_date,
+        items=[item for statement in statements for item in statement.items],
+        business_summary=_build(
+            BusinessSummary,
+            validate,
+            **_sum_fields(stm.business_summary for stm in statements),
+        ),
+        financial_summary=_build(
+            FinancialSummary,
+            validate,
+            **_sum_fields(stm.financial_summary for stm in statements),
+        ),
+        net_price=sum(statement.net_price for statement in statements),
+    )
 
-    for stm in pdf_statements:
-        items.extend(_build_statement_items(stm))
 
-    brokerage_statement = BrokerageStatement(
+def build_statement(
+    pdf_statement: BrokerageStatementPdf, validate: bool = False
+) -> BrokerageStatement:
+    """Build the statement of a single PDF file, checking that it reconciles"""
+    brokerage_statement = _build(
+        BrokerageStatement,
+        validate,
         statement_date=_parse_statement_date(pdf_statement),
-        items=items,
-        business_summary=_build_business_summary(pdf_statement),
-        financial_summary=_build_financial_summary(pdf_statement),
+        items=_build_statement_items(pdf_statement, validate),
+        business_summary=_build_business_summary(pdf_statement, validate),
+        financial_summary=_build_financial_summary(pdf_statement, validate),
         net_price=_parse_net_price(pdf_statement),
     )
 
@@ -37,6 +84,20 @@ def brokerage_statement_factory(
     return brokerage_statement
 
 
+def _sum_fields(models: Iterable[BaseModel]) -> dict[str, Decimal]:
+    totals: dict[str, Decimal] = {}
+    for model in models:
+        for field, value in model:
+            totals[field] = totals.get(field, Decimal(0)) + value
+    return totals
+
+
+def _build(model_class: type[Model], validate: bool, **values) -> Model:
+    if validate:
+        return model_class(**values)
+    return model_class.construct(**values)
+
+
 def _parse_statement_date(pdf_statement: BrokerageStatementPdf) -> datetime:
     return datetime.strptime(
         pdf_statement.statement_date.parsed_content()[0], "%d/%m/%Y"
@@ -46,13 +107,15 @@ def _parse_statement_date(pdf_statement: BrokerageStatementPdf) -> datetime:
 def _parse_net_price(pdf_statement: BrokerageStatementPdf) -> Decimal:
     for item, value in reversed(pdf_statement.financial_summary.table):
         if item.strip().startswith("Liquido para"):
-            return _parse_decimal(value)
+            return _parse_signed_decimal(value)
     raise ValueError(f"Net Price not found in '{pdf_statement.financial_summary}'")
 
 
-def _build_financial_summary(pdf_statement: BrokerageStatementPdf) -> FinancialSummary:
+def _build_financial_summary(
+    pdf_statement: BrokerageStatementPdf, validate: bool = False
+) -> FinancialSummary:
     items = dict(pdf_statement.financial_summary.table)
-    operations_net_value: Decimal = _parse_decimal(
+    operations_net_value: Decimal = _parse_signed_decimal(
         items.get("Valor Líquido das Operações(1)")
     )
     settlement_fee: Decimal = _parse_decimal(items.get("Taxa de Liquidação(2)"))
@@ -60,7 +123,9 @@ def _build_financial_summary(pdf_statement: BrokerageStatementPdf) -> FinancialS
     tax_over_service: Decimal = _parse_decimal(items.get("ISS"))
     brokerage_fee: Decimal = _parse_decimal(items.get("Corretagem"))
 
-    return FinancialSummary(
+    return _build(
+        FinancialSummary,
+        validate,
         operations_net_value=operations_net_value,
         settlement_fee=settlement_fee,
         exchange_fees=exchange_fees,
@@ -69,17 +134,24 @@ def _build_financial_summary(pdf_statement: BrokerageStatementPdf) -> FinancialS
     )
 
 
-def _build_business_summary(pdf_statement: BrokerageStatementPdf) -> BusinessSummary:
-    return BusinessSummary(
+def _build_business_summary(
+    pdf_statement: BrokerageStatementPdf, validate: bool = False
+) -> BusinessSummary:
+    return _build(
+        BusinessSummary,
+        validate,
         operations_total_amount=_parse_decimal(
             pdf_statement.business_summary.operations_total_amount.parsed_content[0]
-        )
+        ),
     )
 
 
-def _build_statement_items(pdf_statement: BrokerageStatementPdf) -> list[StatementItem]:
+def _build_statement_items(
+    pdf_statement: BrokerageStatementPdf, validate: bool = False
+) -> list[StatementItem]:
     statement_items: list[StatementItem] = []
     empty_lines = 0
+    skipped_lines = 0
 
     for (
         security_name,
@@ -90,6 +162,7 @@ def _build_statement_items(pdf_statement: BrokerageStatementPdf) -> list[Stateme
     ) in pdf_statement.securities_table:
 
         if _should_skip_line(security_name):
+            skipped_lines += 1
             continue
 
         if all([security_name.strip() == "", amount.strip() == ""]):
@@ -98,10 +171,12 @@ def _build_statement_items(pdf_statement: BrokerageStatementPdf) -> list[Stateme
         if empty_lines > 1:
             continue
 
-        item = StatementItem(
+        item = _build(
+            StatementItem,
+            validate,
             operation_type=_parse_operation_type(operation_type.strip()),
             security=security_name.split()[0].strip(),
-            amount=amount.strip().replace(".", ""),
+            amount=int(amount.strip().replace(".", "")),
             unit_price=_parse_decimal(price),
             total_price=_parse_decimal(operation_amount),
         )
@@ -112,12 +187,13 @@ def _build_statement_items(pdf_statement: BrokerageStatementPdf) -> list[Stateme
 
         statement_items.append(item)
 
+    profiling.count("rows_parsed", len(statement_items))
+    profiling.count("rows_skipped", skipped_lines)
     return statement_items
 
 
 def _should_skip_line(security_name: str) -> bool:
-    ticker_re = re.compile(r"[a-zA-Z]{4}[0-9]{1,2}")
-    return not ticker_re.match(security_name.strip().split(" ")[0])
+    return not TICKER_RE.match(security_name.strip().split(" ")[0])
 
 
 def _parse_operation_type(raw_op_type):
@@ -129,9 +205,14 @@ def _parse_operation_type(raw_op_type):
 
 
 def _parse_decimal(value: str) -> Decimal:
-    decimal_separator = ","
-    sanitized = re.sub(rf"[^\d{decimal_separator}]", "", value).replace(
-        decimal_separator, "."
-    )
+    sanitized = NON_DECIMAL_RE.sub("", value).replace(DECIMAL_SEPARATOR, ".")
 
     return Decimal(sanitized)
+
+
+def _parse_signed_decimal(value: str) -> Decimal:
+    """A credit (C) is positive and a debit (D, or a leading -) negative"""
+    amount = _parse_decimal(value)
+    if DEBIT_RE.search(value):
+        return -amount
+    return amount
@@ -0,0 +1,240 @@
+"""Positions and average acquisition cost of each security, over time.
+
+The ledger replays the statements of a `StatementStore` in chronological
+order (statements of the same date in order of insertion). Each item moves
+its position at its total price plus the fees apportioned to it, as in the
+console report: buys add to the cost of the position, and sells take out
+their share of it at the average cost, realizing the difference.
+
+Every `snapshot_every` statements the positions are saved in the store's
+database, so bringing the ledger up to date only replays the statements
+after the last valid snapshot. Each snapshot records the last statement id
+it has seen: a statement added later but dated before it makes it stale.
+The positions are then replayed from the snapshot before that statement.
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable
+
+from pydantic import BaseModel
+
+from brokerage_statement import profiling, serialization
+from brokerage_statement.models import BrokerageStatement, OperationType
+from brokerage_statement.report.apportionment import apportion_fees
+from brokerage_statement.store import StatementStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger_snapshots (
+    -- Last statement replayed into the snapshot
+    statement_date TEXT NOT NULL,
+    statement_id INTEGER NOT NULL,
+    -- Statements with a higher id were added after the snapshot
+    last_seen_id INTEGER NOT NULL,
+    positions TEXT NOT NULL,
+    PRIMARY KEY (statement_date, statement_id)
+);
+"""
+
+# A snapshot is valid unless a statement added after it is dated before its
+# last statement. Statements of the same date come after it, by id.
+VALID_SNAPSHOT = """NOT EXISTS (
+    SELECT 1 FROM statements
+    WHERE statements.id > ledger_snapshots.last_seen_id
+    AND statements.statement_date < ledger_snapshots.statement_date
+)"""
+
+
+class Position(BaseModel):
+    security: str
+    # Negative for short positions
+    amount: int = 0
+    # Cost of the current amount, fees included (negative for short positions)
+    cost: Decimal = Decimal(0)
+    # Profit (or loss) of the amounts sold, or bought back
+    realized: Decimal = Decimal(0)
+
+    @property
+    def average_cost(self) -> Decimal:
+        if not self.amount:
+            return Decimal(0)
+        return self.cost / self.amount
+
+    def trade(self, amount: int, value: Decimal) -> None:
+        """Buy (positive `amount`) or sell (negative) for `value`.
+
+        `value` is what the trade costs, fees included: positive for buys,
+        negative (what was received) for sells.
+        """
+        if self.amount and (self.amount > 0) != (amount > 0):
+            # Closes (part of) the position, at its average cost
+            closed = min(abs(amount), abs(self.amount))
+            closed_cost = self.cost * closed / abs(self.amount)
+            closed_value = value * closed / abs(amount)
+            self.realized += -closed_value - closed_cost
+            self.cost -= closed_cost
+            self.amount += closed if amount > 0 else -closed
+
+            amount += -closed if amount > 0 else closed
+            value -= closed_value
+            if not self.amount:
+                self.cost = Decimal(0)
+
+        if amount:
+            self.amount += amount
+            self.cost += value
+
+
+_POSITION_DECIMALS = serialization.decimal_fields(Position)
+
+
+def apply_statement(
+    positions: dict[str, Position], statement: BrokerageStatement
+) -> None:
+    fees = apportion_fees([statement])
+
+    for item, total_with_fees in zip(statement.items, fees.total_with_fees):
+        position = positions.get(item.security)
+        if position is None:
+            position = positions[item.security] = Position(security=item.security)
+
+        if item.operation_type == OperationType.BUY:
+            position.trade(item.amount, total_with_fees)
+        elif item.operation_type == OperationType.SELL:
+            # Fees are paid out of the sale
+            fee = total_with_fees - item.total_price
+            position.trade(-item.amount, fee - item.total_price)
+
+
+class PositionLedger:
+    """Positions after the statements of `store`, kept up to date incrementally"""
+
+    def __init__(self, store: StatementStore, snapshot_every: int = 20):
+        self.store = store
+        self.snapshot_every = snapshot_every
+        self.connection = store.connection
+        self.connection.executescript(SCHEMA)
+        # Positions after the last statement replayed, as (date, id), the
+        # highest statement id seen, and how many statements were replayed
+        # since the last snapshot
+        self._positions: dict[str, Position] | None = None
+        self._last: tuple[datetime, int] | None = None
+        self._last_seen_id = -1
+        self._since_snapshot = 0
+
+    def add(
+        self, statements: Iterable[tuple[str, BrokerageStatement, str | None]]
+    ) -> int:
+        """Store the statements, as `StatementStore.add`, and update the ledger"""
+        added = self.store.add(statements)
+        self.update()
+        return added
+
+    def positions(self, as_of: datetime | None = None) -> dict[str, Position]:
+        """Positions after every statement dated up to `as_of` (all of them)"""
+        if as_of is None:
+            return {
+                security: position.copy()
+                for security, position in self.update().items()
+            }
+
+        self.update()
+        after, positions = self._load_snapshot(as_of)
+        for _, statement in self.store.statement_entries(after, end=as_of):
+            apply_statement(positions, statement)
+        return positions
+
+    def update(self) -> dict[str, Position]:
+        """Replay the statements added to the store since the last update.
+
+        Statements dated from the last one replayed on are applied to the
+        current positions; older ones replay from the snapshot before them.
+        """
+        first_date, last_id = self.connection.execute(
+            "SELECT MIN(statement_date), MAX(id) FROM statements WHERE id > ?",
+            (self._last_seen_id,),
+        ).fetchone()
+        if last_id is None and self._positions is not None:
+            return self._positions
+
+        if first_date is not None:
+            self._drop_stale_snapshots()
+            self._last_seen_id = last_id
+        if not (
+            self._positions is not None
+            and self._last is not None
+            and first_date >= self._last[0].isoformat()
+        ):
+            self._last, self._positions = self._load_snapshot()
+            self._since_snapshot = 0
+
+        assert self._positions is not None
+        self._replay(self._positions)
+        return self._positions
+
+    def _drop_stale_snapshots(self) -> None:
+        """Drop the snapshots missing a statement dated before them.
+
+        Stale snapshots are never loaded, this only keeps them from piling up.
+        """
+        with self.connection:
+            self.connection.execute(
+                f"DELETE FROM ledger_snapshots WHERE NOT {VALID_SNAPSHOT}"
+            )
+
+    def _load_snapshot(
+        self, as_of: datetime | None = None
+    ) -> tuple[tuple[datetime, int] | None, dict[str, Position]]:
+        """Last valid snapshot dated up to `as_of`, as (last statement, positions)"""
+        conditions, params = "", []
+        if as_of is not None:
+            conditions, params = "AND statement_date <= ?", [as_of.isoformat()]
+
+        row = self.connection.execute(
+            "SELECT statement_date, statement_id, positions FROM ledger_snapshots "
+            f"WHERE {VALID_SNAPSHOT} {conditions} "
+            "ORDER BY statement_date DESC, statement_id DESC LIMIT 1",
+            params,
+        ).fetchone()
+        if row is None:
+            return None, {}
+
+        statement_date, statement_id, positions = row
+        return (datetime.fromisoformat(statement_date), statement_id), {
+            security: Position.construct(security=security, **fields)
+            for security, fields in serialization.loads(
+                positions, _POSITION_DECIMALS
+            ).items()
+        }
+
+    def _replay(self, positions: dict[str, Position]) -> None:
+        replayed = 0
+        for statement_id, statement in self.store.statement_entries(self._last):
+            apply_statement(positions, statement)
+            replayed += 1
+            self._last = (statement.statement_date, statement_id)
+            self._since_snapshot += 1
+            if self._since_snapshot >= self.snapshot_every:
+                self._save_snapshot(positions)
+                self._since_snapshot = 0
+
+        profiling.count("ledger_replayed", replayed)
+
+    def _save_snapshot(self, positions: dict[str, Position]) -> None:
+        assert self._last
+        statement_date, statement_id = self._last
+        serialized = {
+            security: position.dict(exclude={"security"})
+            for security, position in positions.items()
+        }
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO ledger_snapshots "
+                "(statement_date, statement_id, last_seen_id, positions) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    statement_date.isoformat(),
+                    statement_id,
+                    self._last_seen_id,
+                    serialization.dumps(serialized),
+                ),
+            )
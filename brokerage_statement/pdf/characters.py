@@ -0,0 +1,92 @@
+from array import array
+from typing import Iterator, Sequence
+
+NO_COORDINATE = float("nan")
+
+
+class CharacterStore:
+    """Compact storage of the characters of a PDF page.
+
+    Instead of keeping pdfminer's LTChar objects (with their fonts, matrices
+    and graphic state) alive, each character extracted from a page takes one
+    position in a set of parallel columns, in reading order. LTAnno elements
+    (the spaces and line breaks inferred by pdfminer) take a position too,
+    without coordinates, and are flagged in `annos`. The page's media box and
+    the names of the fonts used are kept to identify the document layout.
+    """
+
+    def __init__(self) -> None:
+        self.page_box: tuple[float, ...] = ()
+        self.fonts: set[str] = set()
+        self.x0 = array("d")
+        self.x1 = array("d")
+        self.y0 = array("d")
+        self.y1 = array("d")
+        self.annos = bytearray()
+        self.text = ""
+        self._text_offsets = array("L", [0])
+        self._text_parts: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.annos)
+
+    def append_char(
+        self, text: str, x0: float, x1: float, y0: float, y1: float
+    ) -> None:
+        self.x0.append(x0)
+        self.x1.append(x1)
+        self.y0.append(y0)
+        self.y1.append(y1)
+        self.annos.append(0)
+        self._append_text(text)
+
+    def append_anno(self, text: str) -> None:
+        self.x0.append(NO_COORDINATE)
+        self.x1.append(NO_COORDINATE)
+        self.y0.append(NO_COORDINATE)
+        self.y1.append(NO_COORDINATE)
+        self.annos.append(1)
+        self._append_text(text)
+
+    def _append_text(self, text: str) -> None:
+        self._text_parts.append(text)
+        self._text_offsets.append(self._text_offsets[-1] + len(text))
+
+    def freeze(self) -> "PDFPageChars":
+        """Finish the page, returning a selection with all its characters"""
+        self.text += "".join(self._text_parts)
+        self._text_parts = []
+        return PDFPageChars(self, range(len(self)))
+
+    def get_text(self, position: int) -> str:
+        return self.text[
+            self._text_offsets[position] : self._text_offsets[position + 1]
+        ]
+
+    def get_text_between(self, start: int, end: int) -> str:
+        return self.text[self._text_offsets[start] : self._text_offsets[end]]
+
+
+class PDFPageChars:
+    """A selection of characters of a page, as positions into its CharacterStore"""
+
+    __slots__ = ("store", "positions")
+
+    def __init__(self, store: CharacterStore, positions: Sequence[int]):
+        self.store = store
+        self.positions = positions
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.positions)
+
+    def get_text(self) -> str:
+        return "".join(self.store.get_text(position) for position in self.positions)
+
+    @classmethod
+    def from_positions(
+        cls, store: CharacterStore, positions: Sequence[int]
+    ) -> "PDFPageChars":
+        return cls(store, array("l", positions))
@@ -0,0 +1,187 @@
+"""Character extraction without pdfminer's layout analysis.
+
+`extract_pages` builds an LTChar per glyph and groups them into text lines
+and text boxes, which is most of the decoding time. `GlyphCollector` only
+records the text and bounding box of each glyph, and `iter_page_characters`
+groups them into text lines with the same rules as pdfminer's layout (and its
+default LAParams), ending each line with a line break. Lines are read from
+top to bottom, then from left to right.
+"""
+from typing import BinaryIO, Iterator
+
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LAParams, LTPage
+from pdfminer.pdfcolor import PDFColorSpace
+from pdfminer.pdfdevice import PDFTextDevice, PDFTextSeq
+from pdfminer.pdffont import PDFFont, PDFUnicodeNotDefined
+from pdfminer.pdfinterp import (
+    PDFGraphicState,
+    PDFPageInterpreter,
+    PDFResourceManager,
+    PDFTextState,
+)
+from pdfminer.pdfpage import PDFPage
+from pdfminer.utils import Matrix, apply_matrix_pt
+
+from brokerage_statement.pdf.characters import CharacterStore
+from brokerage_statement.pdf.resources import resource_manager
+
+# (text, x0, x1, y0, y1)
+Glyph = tuple[str, float, float, float, float]
+
+_LAPARAMS = LAParams()
+LINE_OVERLAP = _LAPARAMS.line_overlap
+CHAR_MARGIN = _LAPARAMS.char_margin
+WORD_MARGIN = _LAPARAMS.word_margin
+
+
+class GlyphCollector(PDFTextDevice):
+    """Records the glyphs of the current page, in content stream order"""
+
+    def __init__(self, rsrcmgr: PDFResourceManager):
+        super().__init__(rsrcmgr)
+        self.glyphs: list[Glyph] = []
+        self.fonts: set[str] = set()
+
+    def begin_page(self, page: PDFPage, ctm: Matrix) -> None:
+        self.glyphs = []
+        self.fonts = set()
+
+    def render_string(
+        self,
+        textstate: PDFTextState,
+        seq: PDFTextSeq,
+        ncs: PDFColorSpace,
+        graphicstate: PDFGraphicState,
+    ) -> None:
+        self.fonts.add(str(textstate.font.fontname))
+        super().render_string(textstate, seq, ncs, graphicstate)
+
+    def render_char(
+        self,
+        matrix: Matrix,
+        font: PDFFont,
+        fontsize: float,
+        scaling: float,
+        rise: float,
+        cid: int,
+        ncs: PDFColorSpace,
+        graphicstate: PDFGraphicState,
+    ) -> float:
+        # Same bounding box as pdfminer.layout.LTChar
+        try:
+            text = font.to_unichr(cid)
+        except PDFUnicodeNotDefined:
+            text = f"(cid:{cid})"
+
+        textwidth = font.char_width(cid)
+        adv = textwidth * fontsize * scaling
+        if font.is_vertical():
+            vx, vy = font.char_disp(cid)
+            vx = fontsize * 0.5 if vx is None else vx * fontsize * 0.001
+            vy = (1000 - vy) * fontsize * 0.001
+            lower_left = (-vx, vy + rise + adv)
+            upper_right = (-vx + fontsize, vy + rise)
+        else:
+            descent = font.get_descent() * fontsize
+            lower_left = (0, descent + rise)
+            upper_right = (adv, descent + rise + fontsize)
+
+        x0, y0 = apply_matrix_pt(matrix, lower_left)
+        x1, y1 = apply_matrix_pt(matrix, upper_right)
+        if x1 < x0:
+            x0, x1 = x1, x0
+        if y1 < y0:
+            y0, y1 = y1, y0
+
+        self.glyphs.append((text, x0, x1, y0, y1))
+        return adv
+
+
+def iter_page_characters(pdf_file: BinaryIO) -> Iterator[CharacterStore]:
+    """The characters of each page, one text line after the other"""
+    resources = resource_manager()
+    device = GlyphCollector(resources)
+    interpreter = PDFPageInterpreter(resources, device)
+
+    for page in PDFPage.get_pages(pdf_file, caching=True):
+        interpreter.process_page(page)
+        page_store = CharacterStore()
+        page_store.page_box = tuple(page.mediabox)
+        page_store.fonts = device.fonts
+        for line in _sort_lines(_group_lines(device.glyphs)):
+            _append_line(page_store, line)
+        yield page_store
+
+
+def iter_layout_pages(pdf_file: BinaryIO) -> Iterator[LTPage]:
+    """The pages of pdfminer's layout analysis, as `extract_pages`"""
+    resources = resource_manager()
+    device = PDFPageAggregator(resources, laparams=_LAPARAMS)
+    interpreter = PDFPageInterpreter(resources, device)
+
+    for page in PDFPage.get_pages(pdf_file, caching=True):
+        interpreter.process_page(page)
+        yield device.get_result()
+
+
+def _group_lines(glyphs: list[Glyph]) -> list[list[Glyph]]:
+    """Consecutive glyphs that are aligned horizontally, as LTLayoutContainer"""
+    lines: list[list[Glyph]] = []
+    line: list[Glyph] = []
+
+    for glyph in glyphs:
+        if line and not _is_halign(line[-1], glyph):
+            lines.append(line)
+            line = []
+        line.append(glyph)
+    if line:
+        lines.append(line)
+
+    return lines
+
+
+def _is_halign(glyph0: Glyph, glyph1: Glyph) -> bool:
+    _, ax0, ax1, ay0, ay1 = glyph0
+    _, bx0, bx1, by0, by1 = glyph1
+
+    if not (by0 <= ay1 and ay0 <= by1):
+        return False
+    min_height = min(ay1 - ay0, by1 - by0)
+    if min_height * LINE_OVERLAP >= min(abs(ay0 - by1), abs(ay1 - by0)):
+        return False
+
+    hdistance = 0 if bx0 <= ax1 and ax0 <= bx1 else min(abs(ax0 - bx1), abs(ax1 - bx0))
+    return hdistance < max(ax1 - ax0, bx1 - bx0) * CHAR_MARGIN
+
+
+def _sort_lines(lines: list[list[Glyph]]) -> list[list[Glyph]]:
+    """Top to bottom and left to right, with blank lines last like pdfminer"""
+    text_lines: list[tuple[float, float, list[Glyph]]] = []
+    empty_lines: list[list[Glyph]] = []
+
+    for line in lines:
+        x0 = min(glyph[1] for glyph in line)
+        x1 = max(glyph[2] for glyph in line)
+        y0 = min(glyph[3] for glyph in line)
+        y1 = max(glyph[4] for glyph in line)
+        blank = all(glyph[0].isspace() for glyph in line)
+        if blank or x1 <= x0 or y1 <= y0:
+            empty_lines.append(line)
+        else:
+            text_lines.append((-y1, x0, line))
+
+    text_lines.sort(key=lambda entry: entry[:2])
+    return [line for _, _, line in text_lines] + empty_lines
+
+
+def _append_line(page_store: CharacterStore, line: list[Glyph]) -> None:
+    """Add a line, with the spaces LTTextLineHorizontal would insert"""
+    previous_x1 = float("inf")
+    for text, x0, x1, y0, y1 in line:
+        margin = WORD_MARGIN * max(x1 - x0, y1 - y0)
+        if previous_x1 < x0 - margin:
+            page_store.append_anno(" ")
+        page_store.append_char(text, x0, x1, y0, y1)
+        previous_x1 = x1
+    page_store.append_anno("\n")
@@ -58,6 +58,7 @@ class SecurityName(TextBox):
     width_scale = 1.0
     height_scale = 35.0
     increase_left = 8.0
+    span_pages = True
 
 
 class SecurityAmount(TextBox):
@@ -66,6 +67,7 @@ class SecurityAmount(TextBox):
     width_scale = 1.2
     height_scale = 35.0
     increase_right = 1.0
+    span_pages = True
 
 
 class SecurityPrice(TextBox):
@@ -74,6 +76,7 @@ class SecurityPrice(TextBox):
     width_scale = 1.0
     height_scale = 35.0
     increase_right = 1.0
+    span_pages = True
 
 
 class OperationAmount(TextBox):
@@ -82,6 +85,7 @@ class OperationAmount(TextBox):
     width_scale = 1.0
     height_scale = 35.0
     increase_right = 1.0
+    span_pages = True
 
 
 class OperationType(TextBox):
@@ -89,6 +93,7 @@ class OperationType(TextBox):
     text_align = TextAlign.CENTER
     width_scale = 1.0
     height_scale = 35.0
+    span_pages = True
 
 
 class StatementDate(TextBox):
@@ -112,20 +117,12 @@ class BrokerageStatementPdf(PDFDocument):
     financial_summary: FinancialSummary = FinancialSummary()
 
     @property
-    def securities_table(self) -> tuple[tuple[str, str]]:
-        security_name = self.security_name.parsed_content
-        amount = self.security_amount.parsed_content
-        price = self.security_price.parsed_content
-        operation_amount = self.operation_amount.parsed_content
-        operation_type = self.operation_type.parsed_content
-
-        return tuple(
-            zip_longest(
-                security_name,
-                amount,
-                price,
-                operation_amount,
-                operation_type,
-                fillvalue="",
-            )
+    def securities_table(self) -> list[tuple[str, str, str, str, str]]:
+        """(name, amount, price, operation amount, operation type) rows"""
+        return self.extract_table(  # type: ignore[return-value]
+            self.security_name,
+            self.security_amount,
+            self.security_price,
+            self.operation_amount,
+            self.operation_type,
         )
@@ -0,0 +1,152 @@
+"""pdfminer resources shared by the documents of a batch.
+
+pdfminer creates a `PDFResourceManager` per document, and with it decodes
+every font the document uses: its widths, its ToUnicode CMap, its embedded
+font file. Statements from the same broker share those fonts, so within
+`shared_resources()` the fonts decoded by each document are kept in a
+bounded `FontCache` of the process, for the following documents.
+
+Across documents fonts are cached by the digest of their definition (see
+`font_key`), since object ids mean nothing outside their document. Within a
+document, pdfminer's own cache by object id comes first. Predefined CMaps
+are already cached by pdfminer's `CMapDB`, once per process.
+"""
+import contextlib
+import hashlib
+from functools import lru_cache
+from typing import Iterator, Mapping
+
+from pdfminer.pdffont import PDFFont
+from pdfminer.pdfinterp import PDFResourceManager
+from pdfminer.pdftypes import PDFObjRef, PDFStream
+
+from brokerage_statement import profiling
+
+FONT_CACHE_SIZE = 64
+
+
+class FontCache:
+    """The most recently used fonts, by the digest of their definition"""
+
+    def __init__(self, maxsize: int = FONT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._fonts: dict[bytes, PDFFont] = {}
+
+    def __len__(self) -> int:
+        return len(self._fonts)
+
+    def get(self, key: bytes) -> PDFFont | None:
+        font = self._fonts.pop(key, None)
+        if font is not None:
+            self._fonts[key] = font
+        return font
+
+    def add(self, key: bytes, font: PDFFont) -> None:
+        self._fonts.pop(key, None)
+        self._fonts[key] = font
+        while len(self._fonts) > self.maxsize:
+            del self._fonts[next(iter(self._fonts))]
+
+    def clear(self) -> None:
+        self._fonts.clear()
+
+
+class SharedResourceManager(PDFResourceManager):
+    """The resource manager of a document, taking its fonts from `fonts`.
+
+    A cached font keeps a reference to the document it was decoded from, so
+    at most `FontCache.maxsize` documents are kept alive by the cache.
+    """
+
+    def __init__(self, fonts: FontCache):
+        super().__init__(caching=True)
+        self.fonts = fonts
+
+    def get_font(self, objid: object, spec: Mapping[str, object]) -> PDFFont:
+        # Already used by the document, e.g. on a previous page
+        if objid and objid in self._cached_fonts:
+            return self._cached_fonts[objid]
+
+        key = font_key(spec)
+        font = self.fonts.get(key)
+        if font is not None:
+            profiling.count("font_hits")
+        else:
+            profiling.count("font_misses")
+            # Without an object id, pdfminer does not cache the font itself
+            font = super().get_font(None, spec)
+            self.fonts.add(key, font)
+
+        if objid:
+            self._cached_fonts[objid] = font
+        return font
+
+
+def font_key(spec: Mapping[str, object]) -> bytes:
+    """Digest of a font definition, with the objects and streams it refers to"""
+    digest = hashlib.blake2b(digest_size=16)
+    _update_digest(digest, spec, frozenset())
+    return digest.digest()
+
+
+def _update_digest(digest, obj: object, resolving: frozenset[int]) -> None:
+    if isinstance(obj, PDFObjRef):
+        if obj.objid in resolving:
+            # Refers back to an object being digested
+            digest.update(b"R")
+            return
+        resolving = resolving | {obj.objid}
+        obj = obj.resolve()
+
+    if isinstance(obj, PDFStream):
+        # Streams are only decoded when a font is created from them
+        if obj.rawdata is not None:
+            digest.update(b"S%d:" % len(obj.rawdata))
+            digest.update(obj.rawdata)
+        else:
+            data = obj.get_data()
+            digest.update(b"D%d:" % len(data))
+            digest.update(data)
+        obj = obj.attrs
+
+    if isinstance(obj, dict):
+        digest.update(b"{%d" % len(obj))
+        for key in sorted(obj):
+            digest.update(repr(key).encode())
+            _update_digest(digest, obj[key], resolving)
+    elif isinstance(obj, list):
+        digest.update(b"[%d" % len(obj))
+        for item in obj:
+            _update_digest(digest, item, resolving)
+    else:
+        digest.update(repr(obj).encode())
+
+
+@lru_cache(maxsize=None)
+def _get_font_cache() -> FontCache:
+    """The fonts shared by the documents of this process"""
+    return FontCache()
+
+
+_shared: FontCache | None = None
+
+
+@contextlib.contextmanager
+def shared_resources() -> Iterator[FontCache]:
+    """Decode the documents opened inside with the fonts of this process"""
+    global _shared
+
+    previous = _shared
+    _shared = _get_font_cache()
+    try:
+        yield _shared
+    finally:
+        _shared = previous
+
+
+def resource_manager() -> PDFResourceManager:
+    """A resource manager for a new document, sharing the fonts of this
+    process inside `shared_resources()`"""
+    if _shared is not None:
+        return SharedResourceManager(_shared)
+    return PDFResourceManager(caching=True)
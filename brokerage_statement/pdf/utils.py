@@ -1,42 +1,142 @@
 import re
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
 from enum import Enum
-from io import BytesIO
-from typing import Iterable, cast
+from functools import lru_cache
+from typing import BinaryIO, ClassVar, Iterable, Iterator
 
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import LTAnno, LTChar, LTComponent
-from pdfminer.high_level import extract_text
+from pdfminer.layout import LTAnno, LTChar, LTComponent, LTTextBox
 from pydantic import BaseModel, PrivateAttr
 
-PDFPageChars = list[LTChar | LTAnno]
+from brokerage_statement import profiling
+from brokerage_statement.pdf.characters import CharacterStore, PDFPageChars
+from brokerage_statement.pdf.device import (
+    WORD_MARGIN,
+    iter_layout_pages,
+    iter_page_characters,
+)
+from brokerage_statement.source import PDFSource, open_pdf
 
 
 class PDFModel(BaseModel):
-    _file: bytes = PrivateAttr()
+    # Decode with pdfminer's layout analysis (`iter_layout_pages`) instead of
+    # grouping the glyphs into lines with `iter_page_characters`
+    layout_analysis: ClassVar[bool] = False
+
+    # Offsets (per page) where pdfminer's text output ends a text box, only
+    # with layout analysis
+    _text_box_ends: list[list[int]] = PrivateAttr(default_factory=list)
+    _pdf_lines: list[str] | None = PrivateAttr(default=None)
     pdf_pages: list[PDFPageChars] = []
-    pdf_lines: list[str] = []
 
-    def __init__(self, pdf_file: bytes):
-        super().__init__()
-        self._file = pdf_file
-        pdf_file = BytesIO(pdf_file)
-        self.pdf_pages = self._extract_pdf_pages(pdf_file)
-        self.pdf_lines = extract_text(pdf_file).split("\n")
-
-    def _extract_pdf_pages(self, pdf_file: BytesIO) -> list[PDFPageChars]:
+    def __init__(self, pdf_file: PDFSource, stream: bool = False):
+        """Extract the characters of `pdf_file`: a path, bytes or binary file.
+
+        Paths are memory-mapped only while the characters are extracted, no
+        copy of the file is kept.
+        """
+        # As BaseModel.construct(): the defaults are not validated nor copied,
+        # the TextBox fields of documents are replaced by the boxes they load
+        object.__setattr__(
+            self,
+            "__dict__",
+            {name: field.default for name, field in self.__fields__.items()},
+        )
+        object.__setattr__(self, "__fields_set__", set())
+        self._init_private_attributes()
+        with open_pdf(pdf_file) as pdf_stream:
+            self.pdf_pages = self._extract_pdf_pages(pdf_stream, stream)
+
+    @profiling.timed("decode")
+    def _extract_pdf_pages(
+        self, pdf_file: BinaryIO, stream: bool = False
+    ) -> list[PDFPageChars]:
+        """Extract the characters of every page.
+
+        When streaming, pages are decoded one at a time and decoding stops as
+        soon as `_is_extraction_complete` is satisfied.
+        """
         pdf_pages: list[PDFPageChars] = []
-        raw_pages = extract_pages(pdf_file)
+
+        for page_index, pdf_page in enumerate(self._iter_pdf_pages(pdf_file)):
+            pdf_pages.append(pdf_page)
+            if stream and self._is_extraction_complete(page_index, pdf_page):
+                break
+
+        return pdf_pages
+
+    def _is_extraction_complete(self, page_index: int, pdf_page: PDFPageChars) -> bool:
+        return False
+
+    def _iter_pdf_pages(self, pdf_file: BinaryIO) -> Iterator[PDFPageChars]:
+        if self.layout_analysis:
+            page_stores = self._iter_layout_pages(pdf_file)
+        else:
+            page_stores = iter_page_characters(pdf_file)
+
+        for page_store in page_stores:
+            profiling.count("pages_decoded")
+            profiling.count("chars_decoded", len(page_store))
+            yield page_store.freeze()
+
+    def _iter_layout_pages(self, pdf_file: BinaryIO) -> Iterator[CharacterStore]:
+        raw_pages = iter_layout_pages(pdf_file)
 
         for raw_page in raw_pages:
-            pdf_page = []
+            page_store = CharacterStore()
+            page_store.page_box = raw_page.bbox
+            text_box_ends = []
             for raw_elem in raw_page:
                 for text_elem in self._extract_pdf_page_elements(raw_elem):
-                    if isinstance(text_elem, (LTChar, LTAnno)):
-                        pdf_page.append(text_elem)
+                    if isinstance(text_elem, LTChar):
+                        page_store.fonts.add(str(text_elem.fontname))
+                        page_store.append_char(
+                            text_elem.get_text(),
+                            text_elem.x0,
+                            text_elem.x1,
+                            text_elem.y0,
+                            text_elem.y1,
+                        )
+                    elif isinstance(text_elem, LTAnno):
+                        page_store.append_anno(text_elem.get_text())
+
+                if isinstance(raw_elem, LTTextBox):
+                    text_box_ends.append(len(page_store))
+
+            self._text_box_ends.append(text_box_ends)
+            yield page_store
 
-            pdf_pages.append(pdf_page)
+    @property
+    def pdf_lines(self) -> list[str]:
+        """Text lines of the document, page after page.
+
+        With `layout_analysis` they are the lines of pdfminer's `extract_text`,
+        otherwise one per text line, from top to bottom and left to right,
+        each page ending with a form feed line. Built on first access from the
+        already extracted characters, so the document is only decoded once.
+        """
+        if self._pdf_lines is None:
+            self._pdf_lines = self._build_pdf_text().split("\n")
+        return self._pdf_lines
+
+    def _build_pdf_text(self) -> str:
+        text: list[str] = []
+
+        for page_index, pdf_page in enumerate(self.pdf_pages):
+            page_store = pdf_page.store
+            text_box_ends = (
+                self._text_box_ends[page_index] if self._text_box_ends else []
+            )
+            start = 0
+            for end in text_box_ends:
+                text.append(page_store.get_text_between(start, end))
+                text.append("\n")
+                start = end
+            text.append(page_store.get_text_between(start, len(page_store)))
+            text.append("\f")
 
-        return pdf_pages
+        return "".join(text)
 
     def _extract_pdf_page_elements(
         self, page_element: LTComponent
@@ -61,15 +161,136 @@ class PDFModel(BaseModel):
 
 
 class PDFDocument(PDFModel):
-    """A model that accepts TextBox fields"""
+    """A model that accepts TextBox fields.
+
+    The TextBox fields of each subclass are compiled into its
+    `extraction_plan` when the class is created. Their default instances are
+    only a description of the boxes: each document loads new ones.
+
+    With `lazy=True` only the PDF is decoded up front; each TextBox field is
+    loaded the first time it is accessed. `load_fields` loads all of them.
+
+    With `stream=True` the titles are searched page by page while the PDF is
+    decoded, and decoding stops once every field has been found (and boxes
+    spanning pages have reached a page without their title).
 
-    def __init__(self, input_file: bytes):
-        super().__init__(input_file)
+    Otherwise, the titles found in a document are kept as the template of its
+    layout (see `LayoutTemplate`), and documents with the same layout take
+    them from there instead of searching for them.
+    """
 
+    layout_templates: ClassVar[bool] = True
+    extraction_plan: ClassVar["ExtractionPlan"]
+
+    _pages_index: list["PDFPageIndex"] | None = PrivateAttr(default=None)
+    _title_occurrences: "TitleOccurrences | None" = PrivateAttr(default=None)
+    # Rows of each table extracted, by the ids of its columns
+    _tables: dict[tuple[int, ...], list[tuple[str, ...]]] = PrivateAttr(
+        default_factory=dict
+    )
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.extraction_plan = ExtractionPlan.compile(cls)
+
+    def __init__(self, input_file: PDFSource, lazy: bool = False, stream: bool = False):
+        super().__init__(input_file, stream)
+
+        if not lazy:
+            self.load_fields()
+
+    def _is_extraction_complete(self, page_index: int, pdf_page: PDFPageChars) -> bool:
+        if self._title_occurrences is None:
+            self._title_occurrences = TitleOccurrences()
+
+        plan = self.extraction_plan
+        plan.matcher.search_page(pdf_page, page_index, self._title_occurrences)
+
+        for title, span_pages in plan.field_titles:
+            occurrences = self._title_occurrences.get(title)
+            if not occurrences:
+                return False
+            if span_pages and occurrences[-1].page_index == page_index:
+                return False
+
+        return True
+
+    def __getattribute__(self, name: str):
+        value = super().__getattribute__(name)
+        if isinstance(value, TextBox) and value.content is None:
+            value = super().__getattribute__("_load_field")(name)
+        return value
+
+    def load_fields(self) -> None:
         for field in self.__fields__:
-            instance = getattr(self, field)
-            if isinstance(instance, TextBox):
-                instance.load_content(self.pdf_pages)
+            # Loaded by __getattribute__
+            getattr(self, field)
+
+    def _load_field(self, name: str) -> "TextBox":
+        if self._pages_index is None:
+            self._pages_index = [PDFPageIndex(page) for page in self.pdf_pages]
+
+        if self._title_occurrences is None:
+            self._title_occurrences = self._search_titles(self._pages_index)
+
+        box = self.extraction_plan.boxes[name].load(
+            self._pages_index, self._title_occurrences
+        )
+        self.__dict__[name] = box
+        return box
+
+    def _search_titles(self, pages_index: list["PDFPageIndex"]) -> "TitleOccurrences":
+        plan = self.extraction_plan
+        if not self.layout_templates:
+            return plan.matcher.search(self.pdf_pages)
+
+        templates = _get_layout_templates(type(self))
+        fingerprint = layout_fingerprint(self.pdf_pages)
+        template = templates.get(fingerprint)
+        if template is not None and template.matches(pages_index):
+            profiling.count("template_hits")
+            return template.title_occurrences
+
+        profiling.count("template_misses")
+        title_occurrences = plan.matcher.search(self.pdf_pages)
+        if all(title in title_occurrences for title, _ in plan.field_titles):
+            span_titles = [
+                title for title, span_pages in plan.field_titles if span_pages
+            ]
+            templates.add(fingerprint, LayoutTemplate(title_occurrences, span_titles))
+        return title_occurrences
+
+    def extract_table(self, *columns: "TextBox") -> list[tuple[str, ...]]:
+        """Rows of the table made of the `columns` boxes, page after page.
+
+        Instead of splitting the content of each box in lines, the characters
+        of the region the boxes cover are grouped in rows by their baseline,
+        then in the box (if any) they are within, so the cells of a row stay
+        together even when a column is empty or wraps. The rows are extracted
+        once per document.
+        """
+        assert self._pages_index is not None, "The columns must be loaded"
+
+        key = tuple(id(column) for column in columns)
+        if key in self._tables:
+            return self._tables[key]
+
+        # Only the pages where every column was found
+        columns_pages: list[dict[int, list[Boundary]]] = []
+        for column in columns:
+            pages: dict[int, list[Boundary]] = defaultdict(list)
+            for boundary in column._boundaries:
+                pages[boundary.page_index].append(boundary)
+            columns_pages.append(pages)
+        common_pages = set.intersection(*(set(pages) for pages in columns_pages))
+
+        rows: list[tuple[str, ...]] = []
+        for page in sorted(common_pages):
+            page_index = self._pages_index[page]
+            for page_boundaries in zip(*(pages[page] for pages in columns_pages)):
+                rows.extend(extract_rows(page_index, list(page_boundaries)))
+        self._tables[key] = rows
+        return rows
 
 
 class Boundary(BaseModel):
@@ -79,6 +300,26 @@ class Boundary(BaseModel):
     bottom: float | None = None
     page_index: int = 0
 
+    def intersection(self, other: "Boundary") -> "Boundary":
+        return Boundary(
+            left=max(self.left, other.left),
+            right=min(self.right, other.right),
+            top=min(self.top, other.top),
+            bottom=max(self.bottom, other.bottom),
+            page_index=self.page_index,
+        )
+
+    def contains(self, other: "Boundary") -> bool:
+        return all(
+            [
+                other.page_index == self.page_index,
+                other.left >= self.left,
+                other.right <= self.right,
+                other.top <= self.top,
+                other.bottom >= self.bottom,
+            ]
+        )
+
 
 class TextAlign(str, Enum):
     LEFT = "left"
@@ -96,9 +337,11 @@ class TextBoxLayout(BaseModel):
     height_scale: float = 1.0
     increase_left: float = 0.1
     increase_right: float = 0.1
+    # Also read the box below the same title on the following pages
+    span_pages: bool = False
 
-    def _get_line_breaks_count(self, prev: LTChar, current: LTChar) -> int:
-        char_margin = prev.y0 - current.y1
+    def _get_line_breaks_count(self, prev_y0: float, current_y1: float) -> int:
+        char_margin = prev_y0 - current_y1
 
         word_margin_min, word_margin_max = self.word_margin_range
 
@@ -112,26 +355,32 @@ class TextBoxLayout(BaseModel):
 
         return 0
 
-    def _fix_line_breaks(self, characters: list[LTChar]) -> list[LTChar | str]:
+    @profiling.timed("line_breaks")
+    def _fix_line_breaks(self, characters: PDFPageChars) -> list[str]:
         # Replace the line breaks created by PDFMiner by more accurate ones.
-        content: list[LTChar | str] = []
+        content: list[str] = []
+        store = characters.store
+        annos, y0, y1 = store.annos, store.y0, store.y1
 
         found_new_line = False
-        for char in characters:
-            if isinstance(char, LTChar):
-                if content and content[-1].get_text() == " ":
-                    found_new_line = False
-                    content.append(char)
-                    continue
+        previous = 0
+        for position in characters:
+            if annos[position]:
+                found_new_line = True
+                continue
 
-                if found_new_line:
-                    found_new_line = False
-                    linebreak_amount = self._get_line_breaks_count(content[-1], char)
-                    content.extend(["\n"] * linebreak_amount)
+            text = store.get_text(position)
+            if content and content[-1] == " ":
+                found_new_line = False
+            elif found_new_line:
+                found_new_line = False
+                linebreak_amount = self._get_line_breaks_count(
+                    y0[previous], y1[position]
+                )
+                content.extend(["\n"] * linebreak_amount)
 
-                content.append(char)
-            else:
-                found_new_line = True
+            content.append(text)
+            previous = position
 
         return content
 
@@ -180,47 +429,24 @@ class TextBoxLayout(BaseModel):
 
     class Config:
         arbitrary_types_allowed = True
+        # Shared by every document, see `BoxPlan`
+        allow_mutation = False
 
 
 class TextBox(TextBoxLayout):
+    """A box of text below (or next to) its title.
+
+    Subclasses set the title and layout of the box, and may have TextBox
+    fields themselves, searched within the box. The boxes of a document are
+    loaded by its `ExtractionPlan`.
+    """
+
     title: str | None = None
-    box_characters: PDFPageChars = []
+    box_characters: PDFPageChars | None = None
     content: str | None = None
     parent_name: str | None = None
-
-    def load_content(self, pdf_pages_characters: list[PDFPageChars]) -> None:
-        # Define title boundaries
-        title_boundary: Boundary = self._get_title_boundaries(pdf_pages_characters)
-
-        # Based one title's, define the box boundaries
-        box_boundary: Boundary = self._get_box_boundaries(title_boundary)
-
-        # Keep the filtered box to be used by children boxes
-        self.box_characters: PDFPageChars = filter_pdf_characters(
-            pdf_pages_characters, box_boundary
-        )
-
-        # Fix line breaks
-        fixed_content: list[LTChar | str] = self._fix_line_breaks(self.box_characters)
-
-        # Store the actual text content
-        self.content = "".join(
-            [
-                cast(LTChar, c).get_text() if isinstance(c, LTChar) else c
-                for c in fixed_content
-            ]
-        )
-
-        # Load Children Boxes
-        self.load_children()
-
-    def load_children(self):
-        for field in self.__fields__:
-            instance = getattr(self, field)
-            if isinstance(instance, TextBox):
-                instance.height_scale = self.height_scale
-                instance.parent_name = self.title
-                instance.load_content([self.box_characters])
+    # Region of the box on each page it was read from
+    _boundaries: list[Boundary] = PrivateAttr(default_factory=list)
 
     def validate_content(self):
         if not self.content:
@@ -236,96 +462,575 @@ class TextBox(TextBoxLayout):
         assert self.content
         return self.content
 
-    def _get_title_boundaries(self, pdf_characters: list[PDFPageChars]) -> Boundary:
-        matches = 0
-        page_index = 0
-        start_char: LTChar | None = None
-        end_char: LTChar | None = None
 
-        assert self.title, "Title must be set"
+def get_lines_between(start: str, end: str, pdf_lines: list[str]):
+    start_re = re.compile(start)
+    end_re = re.compile(end)
+    start_idx: int | None = None
+    end_idx: int | None = None
+
+    for idx, line in enumerate(pdf_lines):
+        if start_re.match(line):
+            start_idx = idx
+            continue
+
+        if start_idx is not None and end_re.match(line):
+            end_idx = idx
+            break
+
+    if start_idx is not None and end_idx is not None:
+        return pdf_lines[start_idx + 1 : end_idx]
 
-        for idx, pdf_page in enumerate(pdf_characters):
-            page_index = idx
-            for pdf_char in filter(lambda x: isinstance(x, LTChar), pdf_page):
-                if pdf_char.get_text().lower() == self.title[matches].lower():
-                    matches += 1
-                    if matches == 1:
-                        start_char = pdf_char
-                    elif matches == len(self.title):
-                        end_char = pdf_char
-                        break
+    return []
+
+
+class PDFPageIndex:
+    """Grid of buckets over the characters of a page.
+
+    `filter` returns the characters of the page within a boundary, but only
+    visits the buckets overlapping it instead of the whole page.
+    LTAnno elements are not positioned, so a single one is kept between two
+    selected characters whenever the page had any in between them, which is
+    all `TextBoxLayout._fix_line_breaks` looks at.
+    """
+
+    CELL_SIZE = 32.0
+
+    @profiling.timed("box_filtering")
+    def __init__(
+        self,
+        pdf_page: PDFPageChars,
+        boundary: Boundary | None = None,
+        buckets: dict[tuple[int, int], array] | None = None,
+        anno_positions: array | None = None,
+    ):
+        self.pdf_page = pdf_page
+        self.boundary = boundary
+
+        if buckets is None or anno_positions is None:
+            store = pdf_page.store
+            buckets = defaultdict(lambda: array("l"))
+            anno_positions = array("l")
+            for position in pdf_page:
+                if store.annos[position]:
+                    anno_positions.append(position)
                 else:
-                    matches = 0
-                    page_index = 0
-                    start_char = None
-                    end_char = None
+                    cell = self._cell(store.x0[position], store.y0[position])
+                    buckets[cell].append(position)
 
-            if start_char and end_char:
-                break
+        self._buckets = buckets
+        self._anno_positions = anno_positions
 
-        if not all([start_char, end_char]):
-            raise ValueError(
-                "Unable to find boundaries for title: "
-                f"{self.parent_name  + ' -> ' if self.parent_name else ''}{self.title}'"
-            )
+    def _cell(self, x: float, y: float) -> tuple[int, int]:
+        return int(x // self.CELL_SIZE), int(y // self.CELL_SIZE)
 
-        assert start_char
-        assert end_char
+    def clip(self, boundary: Boundary) -> "PDFPageIndex":
+        """A view of this index restricted to `boundary`"""
+        if self.boundary is not None:
+            boundary = boundary.intersection(self.boundary)
 
-        return Boundary(
-            left=start_char.x0,
-            right=end_char.x1,
-            bottom=min(start_char.y0, end_char.y0),
-            top=max(start_char.y1, end_char.y1),
-            page_index=page_index,
+        return PDFPageIndex(
+            self.pdf_page, boundary, self._buckets, self._anno_positions
         )
 
+    @profiling.timed("box_filtering")
+    def filter(self, boundary: Boundary | None = None) -> PDFPageChars:
+        if boundary is None:
+            boundary = self.boundary
+        elif self.boundary is not None:
+            boundary = boundary.intersection(self.boundary)
+
+        assert boundary, "Boundary must be set"
+
+        selected = self.select(boundary)
+        selected.sort()
+
+        filtered_contents: list[int] = []
+        anno_positions = self._anno_positions
+        previous: int | None = None
+        for position in selected:
+            if previous is not None:
+                anno_idx = bisect_right(anno_positions, previous)
+                if (
+                    anno_idx < len(anno_positions)
+                    and anno_positions[anno_idx] < position
+                ):
+                    filtered_contents.append(anno_positions[anno_idx])
+            filtered_contents.append(position)
+            previous = position
+
+        return PDFPageChars.from_positions(self.pdf_page.store, filtered_contents)
+
+    def select(self, boundary: Boundary) -> list[int]:
+        """Positions of the characters within `boundary`, in no given order"""
+        left, right = boundary.left, boundary.right
+        top, bottom = boundary.top, boundary.bottom
+        min_x, min_y = self._cell(left, bottom)
+        # y0 <= y1 <= top, so the top row of cells is bounded by `top`
+        max_x, max_y = self._cell(right, top)
+
+        store = self.pdf_page.store
+        x0, x1, y0, y1 = store.x0, store.x1, store.y0, store.y1
+
+        selected: list[int] = []
+        scanned = 0
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                bucket = self._buckets.get((cell_x, cell_y), ())
+                scanned += len(bucket)
+                for position in bucket:
+                    if (
+                        x0[position] >= left
+                        and x1[position] <= right
+                        and y1[position] <= top
+                        and y0[position] >= bottom
+                    ):
+                        selected.append(position)
+        profiling.count("chars_scanned", scanned)
+
+        return selected
+
+
+@profiling.timed("table_rows")
+def extract_rows(
+    page_index: PDFPageIndex, columns: list[Boundary]
+) -> list[tuple[str, ...]]:
+    """Text of each column, for each row of characters within `columns`.
+
+    The characters of the region covering every column are sorted once by
+    baseline, from the top, and swept into rows: a character starts a new
+    row when its baseline is more than half its height below the row's.
+    Within a row, characters are read from left to right and put in every
+    column they are within. A space is added between characters further
+    apart than pdfminer's word margin.
+    """
+    region = Boundary(
+        left=min(column.left for column in columns),
+        right=max(column.right for column in columns),
+        top=max(column.top for column in columns),
+        bottom=min(column.bottom for column in columns),
+        page_index=columns[0].page_index,
+    )
+    if page_index.boundary is not None:
+        region = region.intersection(page_index.boundary)
+
+    store = page_index.pdf_page.store
+    x0, x1, y0, y1 = store.x0, store.x1, store.y0, store.y1
+    text, offsets = store.text, store._text_offsets
+
+    positions = page_index.select(region)
+    positions.sort(key=lambda position: -y0[position])
+
+    row_groups: list[list[int]] = []
+    row_y0 = float("inf")
+    for position in positions:
+        if row_y0 - y0[position] > (y1[position] - y0[position]) / 2:
+            row_groups.append([])
+            row_y0 = y0[position]
+        row_groups[-1].append(position)
+
+    bounds = [
+        (idx, column.left, column.right, column.top, column.bottom)
+        for idx, column in enumerate(columns)
+    ]
+    rows: list[tuple[str, ...]] = []
+    for row_group in row_groups:
+        row_group.sort(key=x0.__getitem__)
+        cells: list[list[str]] = [[] for _ in columns]
+        previous_x1 = [float("inf")] * len(columns)
+        for position in row_group:
+            char_x0, char_x1 = x0[position], x1[position]
+            char_y0, char_y1 = y0[position], y1[position]
+            char = text[offsets[position] : offsets[position + 1]]
+            for idx, left, right, top, bottom in bounds:
+                if not (
+                    char_x0 >= left
+                    and char_x1 <= right
+                    and char_y1 <= top
+                    and char_y0 >= bottom
+                ):
+                    continue
 
-def filter_pdf_characters(
-    pdf_characters: list[PDFPageChars], boundary: Boundary
-) -> PDFPageChars:
-    filtered_contents = pdf_characters[boundary.page_index]
+                gap = char_x0 - previous_x1[idx]
+                if gap > 0 and gap > WORD_MARGIN * max(
+                    char_x1 - char_x0, char_y1 - char_y0
+                ):
+                    cells[idx].append(" ")
+                cells[idx].append(char)
+                previous_x1[idx] = char_x1
+
+        rows.append(tuple("".join(cell) for cell in cells))
+
+    return rows
+
+
+class TitleOccurrences(dict[str, list[Boundary]]):
+    """Boundaries of every occurrence of each (lowercase) title, in reading order"""
+
+    def within(
+        self, boundary: Boundary, titles: Iterable[str] | None = None
+    ) -> "TitleOccurrences":
+        """Occurrences (of `titles`) inside `boundary`, relative to the box's
+        own page"""
+        if titles is None:
+            titles = self.keys()
+        return TitleOccurrences(
+            {
+                title: [
+                    occurrence.copy(update={"page_index": 0})
+                    for occurrence in self.get(title, [])
+                    if boundary.contains(occurrence)
+                ]
+                for title in titles
+            }
+        )
 
-    def filter_func(value):
-        if not isinstance(value, LTChar):
-            return True
 
-        return all(
-            [
-                value.x0 >= boundary.left,
-                value.x1 <= boundary.right,
-                value.y1 <= boundary.top,
-                value.y0 >= boundary.bottom,
+class TitleMatcher:
+    """Aho-Corasick automaton that finds every title in a single pass.
+
+    Matching is case insensitive and only LTChar elements are considered, so
+    LTAnno never breaks a title.
+    """
+
+    def __init__(self, titles: Iterable[str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[list[str]] = [[]]
+
+        for title in {title.lower() for title in titles}:
+            state = 0
+            for symbol in title:
+                if symbol not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][symbol] = len(self._goto) - 1
+                state = self._goto[state][symbol]
+            self._output[state].append(title)
+
+        # Breadth-first, so the failure state of the parent is always known
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for symbol, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and symbol not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(symbol, 0)
+                self._output[next_state].extend(self._output[self._fail[next_state]])
+
+    def _next_state(self, state: int, symbol: str) -> int:
+        while state and symbol not in self._goto[state]:
+            state = self._fail[state]
+        return self._goto[state].get(symbol, 0)
+
+    def search(self, pdf_pages: list[PDFPageChars]) -> TitleOccurrences:
+        occurrences = TitleOccurrences()
+
+        for page_index, pdf_page in enumerate(pdf_pages):
+            self.search_page(pdf_page, page_index, occurrences)
+
+        return occurrences
+
+    @profiling.timed("title_search")
+    def search_page(
+        self,
+        pdf_page: PDFPageChars,
+        page_index: int,
+        occurrences: TitleOccurrences,
+    ) -> None:
+        """Add the occurrences found in `pdf_page` to `occurrences`"""
+        store = pdf_page.store
+        state = 0
+        page_chars: list[int] = []
+        for position in pdf_page:
+            if store.annos[position]:
+                continue
+
+            page_chars.append(position)
+            state = self._next_state(state, store.get_text(position).lower())
+            for title in self._output[state]:
+                start_char = page_chars[-len(title)]
+                end_char = position
+                occurrences.setdefault(title, []).append(
+                    Boundary(
+                        left=store.x0[start_char],
+                        right=store.x1[end_char],
+                        bottom=min(store.y0[start_char], store.y0[end_char]),
+                        top=max(store.y1[start_char], store.y1[end_char]),
+                        page_index=page_index,
+                    )
+                )
+
+
+def layout_fingerprint(pdf_pages: list[PDFPageChars]) -> tuple:
+    """Identifies the layout of a document.
+
+    Made of the size of its pages, the fonts it uses and its first line of
+    text, which is usually the name of the document or of the broker.
+    """
+    page_boxes = tuple(pdf_page.store.page_box for pdf_page in pdf_pages)
+    fonts = set().union(*(pdf_page.store.fonts for pdf_page in pdf_pages))
+    first_line = pdf_pages[0].store.text.lstrip().split("\n", 1)[0] if pdf_pages else ""
+    return page_boxes, tuple(sorted(fonts)), first_line
+
+
+class LayoutTemplate:
+    """Where the titles are in every document of a given layout.
+
+    Boxes spanning pages continue on every page with their title, which may
+    differ between documents of the same layout. The pages without each of
+    `span_titles` in the template are searched for them.
+    """
+
+    def __init__(
+        self, title_occurrences: TitleOccurrences, span_titles: Iterable[str] = ()
+    ):
+        self.title_occurrences = title_occurrences
+        self._span_pages = {
+            title: {occurrence.page_index for occurrence in title_occurrences[title]}
+            for title in span_titles
+        }
+        self._span_matcher = TitleMatcher(self._span_pages)
+
+    @profiling.timed("title_search")
+    def matches(self, pages_index: list[PDFPageIndex]) -> bool:
+        """Whether each title is still where it was in the template, and
+        the boxes spanning pages do not continue on any other page.
+
+        Only the characters within the boundary of each occurrence are read,
+        through the index of its page, besides the pages searched for the
+        titles of the boxes spanning pages.
+        """
+        for title, occurrences in self.title_occurrences.items():
+            for occurrence in occurrences:
+                if occurrence.page_index >= len(pages_index):
+                    return False
+
+                characters = pages_index[occurrence.page_index].filter(occurrence)
+                store = characters.store
+                text = "".join(
+                    store.get_text(position).lower()
+                    for position in characters
+                    if not store.annos[position]
+                )
+                if text != title:
+                    return False
+
+        for page, page_index in enumerate(pages_index):
+            missing = [
+                title for title, pages in self._span_pages.items() if page not in pages
             ]
+            if not missing:
+                continue
+
+            found = TitleOccurrences()
+            self._span_matcher.search_page(page_index.pdf_page, page, found)
+            if any(title in found for title in missing):
+                return False
+
+        return True
+
+
+class LayoutTemplateCache:
+    """The templates of the most recently seen layouts, by fingerprint"""
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self._templates: dict[tuple, LayoutTemplate] = {}
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def get(self, fingerprint: tuple) -> LayoutTemplate | None:
+        template = self._templates.pop(fingerprint, None)
+        if template is not None:
+            self._templates[fingerprint] = template
+        return template
+
+    def add(self, fingerprint: tuple, template: LayoutTemplate) -> None:
+        self._templates.pop(fingerprint, None)
+        self._templates[fingerprint] = template
+        while len(self._templates) > self.maxsize:
+            del self._templates[next(iter(self._templates))]
+
+    def clear(self) -> None:
+        self._templates.clear()
+
+
+class BoxPlan(BaseModel):
+    """How a TextBox field is loaded, compiled from the defaults of its class.
+
+    The geometry of children boxes takes the height of their parent's, and
+    their titles are only searched within it.
+    """
+
+    name: str
+    box_class: type[TextBox]
+    title: str | None
+    layout: TextBoxLayout
+    parent_name: str | None = None
+    children: tuple["BoxPlan", ...] = ()
+    # Lowercase titles of the children boxes, and of theirs
+    child_titles: frozenset[str] = frozenset()
+
+    class Config:
+        allow_mutation = False
+
+    @classmethod
+    def compile_fields(
+        cls,
+        model_class: type[BaseModel],
+        parent_name: str | None = None,
+        height_scale: float | None = None,
+    ) -> tuple["BoxPlan", ...]:
+        """Plans of the TextBox fields of `model_class`, children of the box
+        titled `parent_name` and `height_scale` tall if any"""
+        plans = []
+        for name, field in model_class.__fields__.items():
+            box = field.default
+            if not isinstance(box, TextBox):
+                continue
+
+            layout_values = {
+                layout_field: getattr(box, layout_field)
+                for layout_field in TextBoxLayout.__fields__
+            }
+            if height_scale is not None:
+                layout_values["height_scale"] = height_scale
+            layout = TextBoxLayout(**layout_values)
+
+            children = cls.compile_fields(type(box), box.title, layout.height_scale)
+            plans.append(
+                cls(
+                    name=name,
+                    box_class=type(box),
+                    title=box.title,
+                    layout=layout,
+                    parent_name=parent_name,
+                    children=children,
+                    child_titles=frozenset(
+                        title for child in children for title in child.titles()
+                    ),
+                )
+            )
+
+        return tuple(plans)
+
+    def titles(self) -> list[str]:
+        """Lowercase titles of this box and of its children"""
+        titles = [self.title.lower()] if self.title else []
+        return titles + list(self.child_titles)
+
+    def load(
+        self,
+        pages_index: list[PDFPageIndex],
+        title_occurrences: TitleOccurrences,
+    ) -> TextBox:
+        """A new box, with its content and children read from the pages"""
+        layout = self.layout
+        title_boundary = self._find_title_boundary(title_occurrences)
+
+        # Based one title's, define the box boundaries
+        box_boundary = layout._get_box_boundaries(title_boundary)
+        boundaries = [box_boundary]
+
+        # Keep the filtered box to be used by children boxes
+        box_index = pages_index[box_boundary.page_index].clip(box_boundary)
+        box_characters = box_index.filter()
+
+        if profiling.enabled():
+            profiling.count(f"chars_kept.{self.title}", len(box_characters))
+
+        content = "".join(layout._fix_line_breaks(box_characters))
+
+        # Append the continuation of the box from the following pages
+        if layout.span_pages:
+            contents = [content]
+            for continuation in self._find_continuation_boundaries(
+                title_occurrences, title_boundary
+            ):
+                continuation_boundary = layout._get_box_boundaries(continuation)
+                boundaries.append(continuation_boundary)
+                page_index = pages_index[continuation_boundary.page_index]
+                characters = page_index.filter(continuation_boundary)
+                contents.append("".join(layout._fix_line_breaks(characters)))
+            content = "\n".join(contents)
+
+        children: dict[str, TextBox] = {}
+        if self.children:
+            # The titles found inside the box, for the children boxes
+            box_occurrences = title_occurrences.within(box_boundary, self.child_titles)
+            for child in self.children:
+                children[child.name] = child.load([box_index], box_occurrences)
+
+        # Every field is given, so no default is copied
+        box = self.box_class.construct(
+            **dict(layout),
+            title=self.title,
+            box_characters=box_characters,
+            content=content,
+            parent_name=self.parent_name,
+            **children,
         )
+        box._boundaries = boundaries
+        return box
 
-    filtered_contents = list(filter(filter_func, filtered_contents))
+    def _find_title_boundary(self, title_occurrences: TitleOccurrences) -> Boundary:
+        assert self.title, "Title must be set"
 
-    while filtered_contents and isinstance(filtered_contents[0], LTAnno):
-        del filtered_contents[0]
+        if boundaries := title_occurrences.get(self.title.lower()):
+            return boundaries[0]
 
-    while filtered_contents and isinstance(filtered_contents[-1], LTAnno):
-        del filtered_contents[-1]
+        raise ValueError(
+            "Unable to find boundaries for title: "
+            f"{self.parent_name  + ' -> ' if self.parent_name else ''}{self.title}'"
+        )
 
-    return filtered_contents
+    def _find_continuation_boundaries(
+        self, title_occurrences: TitleOccurrences, title_boundary: Boundary
+    ) -> list[Boundary]:
+        """First occurrence of the title on each page after `title_boundary`"""
+        assert self.title, "Title must be set"
 
+        continuations: list[Boundary] = []
+        page_index = title_boundary.page_index
+        for occurrence in title_occurrences.get(self.title.lower(), []):
+            if occurrence.page_index > page_index:
+                continuations.append(occurrence)
+                page_index = occurrence.page_index
 
-def get_lines_between(start: str, end: str, pdf_lines: list[str]):
-    start_re = re.compile(start)
-    end_re = re.compile(end)
-    start_idx: int | None = None
-    end_idx: int | None = None
+        return continuations
 
-    for idx, line in enumerate(pdf_lines):
-        if start_re.match(line):
-            start_idx = idx
-            continue
 
-        if start_idx is not None and end_re.match(line):
-            end_idx = idx
-            break
+BoxPlan.update_forward_refs()
 
-    if start_idx is not None and end_idx is not None:
-        return pdf_lines[start_idx + 1 : end_idx]
 
-    return []
+class ExtractionPlan(BaseModel):
+    """The TextBox fields of a PDFDocument class, compiled with the class"""
+
+    boxes: dict[str, BoxPlan]
+    # (lowercase title, span_pages) of each top level box
+    field_titles: tuple[tuple[str, bool], ...]
+    matcher: TitleMatcher
+
+    class Config:
+        allow_mutation = False
+        arbitrary_types_allowed = True
+
+    @classmethod
+    def compile(cls, document_class: type[PDFDocument]) -> "ExtractionPlan":
+        boxes = BoxPlan.compile_fields(document_class)
+        return cls(
+            boxes={box.name: box for box in boxes},
+            field_titles=tuple(
+                (box.title.lower(), box.layout.span_pages) for box in boxes if box.title
+            ),
+            matcher=TitleMatcher(title for box in boxes for title in box.titles()),
+        )
+
+
+@lru_cache(maxsize=None)
+def _get_layout_templates(document_class: type[PDFDocument]) -> LayoutTemplateCache:
+    return LayoutTemplateCache()
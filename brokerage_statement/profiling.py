@@ -0,0 +1,129 @@
+"""Per-stage timers and counters of the parser.
+
+Instrumented code calls `count` and functions decorated with `timed` report
+how long they took, but only while a hook is registered: with no hooks,
+`timed` is a single extra call and `count` returns right away.
+
+Stages (they may nest, e.g. title_search runs inside decode when streaming):
+decode, title_search, box_filtering, line_breaks, table_rows, factory and
+report.
+
+Counters:
+    pages_decoded, chars_decoded: decoded by pdfminer
+    chars_scanned: characters visited while filtering boxes
+    chars_kept.<title>: characters inside each box
+    rows_parsed: securities rows turned into StatementItems
+    rows_skipped: rows rejected by `_should_skip_line`
+    cache_hits: statements read from the cache instead of parsed
+    template_hits, template_misses: documents whose titles were (not) taken
+        from the template of their layout
+    ledger_replayed: statements replayed by the position ledger
+    rollups_replaced: statements replaced in the monthly rollups
+    font_hits, font_misses: fonts taken from (added to) the shared font cache
+"""
+import contextlib
+import time
+from functools import wraps
+from typing import Callable, Iterator, Protocol, TypeVar
+
+from pydantic import BaseModel
+
+F = TypeVar("F", bound=Callable)
+
+
+class ProfileHook(Protocol):
+    def on_stage(self, stage: str, seconds: float) -> None:
+        ...
+
+    def on_count(self, counter: str, value: int) -> None:
+        ...
+
+
+_hooks: list[ProfileHook] = []
+
+
+def add_hook(hook: ProfileHook) -> None:
+    _hooks.append(hook)
+
+
+def remove_hook(hook: ProfileHook) -> None:
+    _hooks.remove(hook)
+
+
+def enabled() -> bool:
+    return bool(_hooks)
+
+
+def count(counter: str, value: int = 1) -> None:
+    for hook in _hooks:
+        hook.on_count(counter, value)
+
+
+def timed(stage: str) -> Callable[[F], F]:
+    """Report the time spent in the decorated function as `stage`"""
+
+    def decorator(func: F) -> F:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _hooks:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                for hook in _hooks:
+                    hook.on_stage(stage, elapsed)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+class Profile(BaseModel):
+    """Collects the stages (in seconds) and counters it is notified of"""
+
+    documents: int = 0
+    stages: dict[str, float] = {}
+    counters: dict[str, int] = {}
+
+    def on_stage(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def on_count(self, counter: str, value: int) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def merge(self, other: "Profile") -> None:
+        self.documents += other.documents
+        for stage, seconds in other.stages.items():
+            self.on_stage(stage, seconds)
+        for counter, value in other.counters.items():
+            self.on_count(counter, value)
+
+
+class ProfileReport(BaseModel):
+    """Profile of each document, plus all of them aggregated"""
+
+    documents: dict[str, Profile] = {}
+    total: Profile = Profile()
+
+    def add(self, name: str, profile: Profile) -> None:
+        self.documents[name] = profile
+        self.total.merge(profile)
+
+
+@contextlib.contextmanager
+def profile(collected: Profile | None = None) -> Iterator[Profile]:
+    """Profile everything run inside the block, as a single document.
+
+    Pass the profile of a previous block to keep adding to it.
+    """
+    if collected is None:
+        collected = Profile(documents=1)
+
+    add_hook(collected)
+    try:
+        yield collected
+    finally:
+        remove_hook(collected)
@@ -0,0 +1,99 @@
+import heapq
+from decimal import Decimal
+from typing import Iterable
+
+from pydantic import BaseModel
+
+from brokerage_statement.models import BrokerageStatement
+
+CENTS = Decimal("0.01")
+
+
+class ApportionedFees(BaseModel):
+    """Statement fees prorated over the items, one column per value.
+
+    Row `n` of every column refers to the n-th item of the apportioned
+    statements, in order; `statement_index` tells which statement it came
+    from. The fees of each item are whole cents and, per statement, add up
+    exactly to the fees in its financial summary.
+    """
+
+    statement_index: list[int] = []
+    percent: list[Decimal] = []
+    settlement_fee: list[Decimal] = []
+    exchange_fees: list[Decimal] = []
+    tax_over_service: list[Decimal] = []
+    total_with_fees: list[Decimal] = []
+
+
+def apportion_fees(statements: Iterable[BrokerageStatement]) -> ApportionedFees:
+    """Prorate settlement fee, emolumentos and ISS by each item's total price"""
+    statement_index: list[int] = []
+    percent: list[Decimal] = []
+    weights: list[int] = []
+    fee_columns: list[list[int]] = [[], [], []]
+
+    for idx, statement in enumerate(statements):
+        statement_weights = [_to_cents(item.total_price) for item in statement.items]
+        summary = statement.financial_summary
+        fees = (
+            summary.settlement_fee,
+            summary.exchange_fees,
+            summary.tax_over_service,
+        )
+
+        for fee, column in zip(fees, fee_columns):
+            column.extend(largest_remainder(_to_cents(fee), statement_weights))
+
+        operations_total_amount = statement.business_summary.operations_total_amount
+        statement_index.extend([idx] * len(statement_weights))
+        percent.extend(
+            item.total_price / operations_total_amount for item in statement.items
+        )
+        weights.extend(statement_weights)
+
+    settlement_fee, exchange_fees, tax_over_service = fee_columns
+    total_with_fees = list(map(sum, zip(weights, *fee_columns)))
+
+    # Every column is built here already typed, so skip pydantic's validation
+    return ApportionedFees.construct(
+        statement_index=statement_index,
+        percent=percent,
+        settlement_fee=_from_cents(settlement_fee),
+        exchange_fees=_from_cents(exchange_fees),
+        tax_over_service=_from_cents(tax_over_service),
+        total_with_fees=_from_cents(total_with_fees),
+    )
+
+
+def largest_remainder(total: int, weights: list[int]) -> list[int]:
+    """Split `total` proportionally to `weights` in integer parts.
+
+    Every part gets the floor of its exact share, and the units left over go
+    to the parts with the largest remainders (the first ones on ties), so the
+    parts always add up to `total`.
+    """
+    weights_sum = sum(weights)
+    if not weights_sum:
+        return [0] * len(weights)
+
+    shares = [divmod(total * weight, weights_sum) for weight in weights]
+    parts = [quotient for quotient, _ in shares]
+
+    leftover = total - sum(parts)
+    if leftover:
+        by_remainder = heapq.nlargest(
+            leftover, range(len(shares)), key=lambda idx: shares[idx][1]
+        )
+        for idx in by_remainder:
+            parts[idx] += 1
+
+    return parts
+
+
+def _to_cents(value: Decimal) -> int:
+    return int(value.quantize(CENTS).scaleb(2))
+
+
+def _from_cents(values: list[int]) -> list[Decimal]:
+    return [Decimal(value).scaleb(-2) for value in values]
@@ -1,64 +1,39 @@
+from brokerage_statement import profiling
+from brokerage_statement.aggregate import StatementAggregator, StatementTotals
 from brokerage_statement.models import BrokerageStatement
+from brokerage_statement.report.apportionment import apportion_fees
 
 SEPARATOR = "-" * 170
 BOLD = "\u001b[1m"
 CLEAN = "\u001b[0m"
+TOTALS_TEMPLATE = "{: >12} {: >8} {: >8} {: >15.2f} {: >15.2f} {: >20.2f} {: >15.2f} {: >8.2f} {: >12.2f} {: >15.2f}"
 TABLE_HEADER_TEMPLATE = "{: >15.2f} {: >10} {: >15} {: >15} {: >15} {: >20.2f} {: >15.2f} {: >8.2f} {: >17.2f} {: >10}"
 
 
 def _calculate_report(brokerage_statement: BrokerageStatement) -> list[list[str]]:
-
-    settlement_fee = brokerage_statement.financial_summary.settlement_fee
-    exchange_fees = brokerage_statement.financial_summary.exchange_fees
-    tax_over_service = brokerage_statement.financial_summary.tax_over_service
-    operations_total_amount = (
-        brokerage_statement.business_summary.operations_total_amount
+    fees = apportion_fees([brokerage_statement])
+
+    columns = [
+        fees.percent,
+        [item.security for item in brokerage_statement.items],
+        [item.amount for item in brokerage_statement.items],
+        [item.unit_price for item in brokerage_statement.items],
+        [item.total_price for item in brokerage_statement.items],
+        fees.settlement_fee,
+        fees.exchange_fees,
+        fees.tax_over_service,
+        fees.total_with_fees,
+        [item.operation_type for item in brokerage_statement.items],
+    ]
+
+    report_rows: list[list[str]] = [list(row) for row in zip(*columns)]
+    report_rows.append(
+        [
+            "-----" if column and isinstance(column[0], str) else sum(column)
+            for column in columns
+        ]
     )
 
-    report_rows: list[list[str]] = []
-
-    for item in brokerage_statement.items:
-        percent = item.total_price / operations_total_amount
-        sec_settlement_fee = settlement_fee * percent
-        sec_exchange_fees = exchange_fees * percent
-        sec_tax_over_service = tax_over_service * percent
-
-        total_with_fees = sum(
-            [
-                item.total_price,
-                sec_settlement_fee,
-                sec_exchange_fees,
-                sec_tax_over_service,
-            ]
-        )
-
-        report_rows.append(
-            [
-                percent,
-                item.security,
-                item.amount,
-                item.unit_price,
-                item.total_price,
-                sec_settlement_fee,
-                sec_exchange_fees,
-                sec_tax_over_service,
-                total_with_fees,
-                item.operation_type,
-            ]
-        )
-
-    report_rows.append([])
-    for column_idx in range(len(report_rows[0])):
-        totals = 0
-
-        if isinstance(report_rows[0][column_idx], str):
-            report_rows[-1].append("-----")
-            continue
-
-        for row in report_rows[:-1]:
-            totals += row[column_idx]
-        report_rows[-1].append(totals)
-
     return report_rows
 
 
@@ -77,6 +52,7 @@ def _draw_report_item_line(report_item: list[str]) -> str:
     ).replace(".", ",")
 
 
+@profiling.timed("report")
 def calculate_brokerage_statement(brokerage_statement: BrokerageStatement):
     report_items: list[list[str]] = _calculate_report(brokerage_statement)
     operations_net_value = brokerage_statement.financial_summary.operations_net_value
@@ -116,3 +92,54 @@ def calculate_brokerage_statement(brokerage_statement: BrokerageStatement):
     output.append(BOLD + SEPARATOR + CLEAN)
 
     print("\n".join(output))
+
+
+def _draw_totals_line(label: str, totals: StatementTotals) -> str:
+    return TOTALS_TEMPLATE.format(
+        label,
+        totals.statements,
+        totals.items,
+        totals.sold,
+        totals.bought,
+        totals.settlement_fee,
+        totals.exchange_fees,
+        totals.tax_over_service,
+        totals.brokerage_fee,
+        totals.net_price,
+    ).replace(".", ",")
+
+
+@profiling.timed("report")
+def print_totals(aggregator: StatementAggregator) -> None:
+    output: list[str] = [BOLD + SEPARATOR + CLEAN]
+    output.append(
+        BOLD
+        + TOTALS_TEMPLATE.replace(".2f", "").format(
+            "DATA",
+            "NOTAS",
+            "ITENS",
+            "VENDAS",
+            "COMPRAS",
+            "TAXA DE LIQUIDAÇÃO",
+            "EMOLUMENTOS",
+            "ISS",
+            "CORRETAGEM",
+            "LÍQUIDO",
+        )
+        + CLEAN
+    )
+
+    for statement_date, totals in aggregator.dates():
+        output.append(_draw_totals_line(f"{statement_date:%d/%m/%Y}", totals))
+
+    output.append(SEPARATOR)
+    output.append(_draw_totals_line("TOTAL", aggregator.total))
+    output.append(BOLD + SEPARATOR + CLEAN)
+
+    if aggregator.total.unreconciled:
+        output.append(
+            f"{aggregator.total.unreconciled} statement(s) do not reconcile "
+            "with their operations total"
+        )
+
+    print("\n".join(output))
@@ -0,0 +1,254 @@
+"""Monthly totals of the statements, kept up to date as they are added.
+
+Each statement adds its totals to its month: volumes sold and bought, the
+fees apportioned to them as in the console report, the fees of the
+statement and its net price. The contribution of each statement is kept
+along with the monthly totals, under a key identifying the statement. Adding
+a statement under a key already rolled up, e.g. a corrected statement,
+replaces it: its previous contribution is taken out of its month first.
+
+Month-to-date and year-to-date totals are read from the monthly totals, at
+most twelve rows, without reading the statements again. Realized profit
+depends on every earlier statement, `PositionLedger` keeps it and
+`realized_profit` reads a month's out of it.
+"""
+import re
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Iterable
+
+from pydantic import BaseModel
+
+from brokerage_statement import profiling, serialization
+from brokerage_statement.ledger import PositionLedger
+from brokerage_statement.models import BrokerageStatement, OperationType
+from brokerage_statement.report.apportionment import apportion_fees
+from brokerage_statement.store import StatementStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_statements (
+    key TEXT PRIMARY KEY,
+    -- As YYYY-MM
+    month TEXT NOT NULL,
+    totals TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS monthly_rollups (
+    month TEXT PRIMARY KEY,
+    totals TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollup_state (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    -- Stored statements with a higher id are not rolled up yet
+    last_statement_id INTEGER NOT NULL
+);
+"""
+
+# Stock sales up to this amount in a month are exempt from income tax
+SALES_EXEMPTION_LIMIT = Decimal(20000)
+# Common (3) and preferred (4 to 8) shares. Tickers ending in 11 are ETFs, real
+# estate funds (FIIs) or units, whose sales are not exempt as stock sales.
+STOCK_TICKER_RE = re.compile(r"^[A-Z0-9]{4}[3-8]F?$")
+
+
+class MonthlyTotals(BaseModel):
+    statements: int = 0
+    items: int = 0
+    sold: Decimal = Decimal(0)
+    bought: Decimal = Decimal(0)
+    # The part of `sold` that were stock sales
+    stocks_sold: Decimal = Decimal(0)
+    # Settlement fee, exchange fees and ISS apportioned to the items
+    sold_fees: Decimal = Decimal(0)
+    bought_fees: Decimal = Decimal(0)
+    settlement_fee: Decimal = Decimal(0)
+    exchange_fees: Decimal = Decimal(0)
+    tax_over_service: Decimal = Decimal(0)
+    brokerage_fee: Decimal = Decimal(0)
+    net_price: Decimal = Decimal(0)
+
+    @property
+    def stock_sales_exempt(self) -> bool:
+        """Whether the stock sales are within the monthly income tax exemption.
+
+        Only sales of stocks count towards the limit, and only their profit
+        is exempt: the sales of ETFs and FIIs are taxed whatever their volume.
+        """
+        return self.stocks_sold <= SALES_EXEMPTION_LIMIT
+
+    def add(self, other: "MonthlyTotals", sign: int = 1) -> None:
+        """Add the totals of `other`, or take them out with `sign=-1`"""
+        for field in self.__fields__:
+            setattr(self, field, getattr(self, field) + sign * getattr(other, field))
+
+
+def statement_totals(statement: BrokerageStatement) -> MonthlyTotals:
+    """What `statement` adds to the totals of its month"""
+    fees = apportion_fees([statement])
+    summary = statement.financial_summary
+    totals = MonthlyTotals.construct(
+        statements=1,
+        items=len(statement.items),
+        sold=Decimal(0),
+        bought=Decimal(0),
+        stocks_sold=Decimal(0),
+        sold_fees=Decimal(0),
+        bought_fees=Decimal(0),
+        settlement_fee=summary.settlement_fee,
+        exchange_fees=summary.exchange_fees,
+        tax_over_service=summary.tax_over_service,
+        brokerage_fee=summary.brokerage_fee,
+        net_price=statement.net_price,
+    )
+
+    for item, settlement_fee, exchange_fees, tax_over_service in zip(
+        statement.items, fees.settlement_fee, fees.exchange_fees, fees.tax_over_service
+    ):
+        fee = settlement_fee + exchange_fees + tax_over_service
+        if item.operation_type == OperationType.SELL:
+            totals.sold += item.total_price
+            totals.sold_fees += fee
+            if is_stock(item.security):
+                totals.stocks_sold += item.total_price
+        elif item.operation_type == OperationType.BUY:
+            totals.bought += item.total_price
+            totals.bought_fees += fee
+
+    return totals
+
+
+def is_stock(security: str) -> bool:
+    """Whether `security`, a B3 ticker, is a company's stock"""
+    return STOCK_TICKER_RE.match(security) is not None
+
+
+def realized_profit(ledger: PositionLedger, year: int, month: int) -> Decimal:
+    """Profit (or loss) realized by the statements dated in the month"""
+
+    def realized_until(end: datetime) -> Decimal:
+        positions = ledger.positions(as_of=end - timedelta(microseconds=1))
+        return sum((position.realized for position in positions.values()), Decimal(0))
+
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    return realized_until(end) - realized_until(start)
+
+
+class MonthlyRollups:
+    """Totals of each month, in the database of `store`"""
+
+    def __init__(self, store: StatementStore):
+        self.store = store
+        self.connection = store.connection
+        self.connection.executescript(SCHEMA)
+
+    def add(self, statements: Iterable[tuple[str, BrokerageStatement]]) -> int:
+        """Roll up (key, statement) entries in one transaction.
+
+        A statement whose key was already rolled up replaces the previous
+        one. Returns how many statements were replaced.
+        """
+        replaced = 0
+        with self.connection:
+            for key, statement in statements:
+                replaced += self._add(key, statement)
+
+        profiling.count("rollups_replaced", replaced)
+        return replaced
+
+    def update(self) -> int:
+        """Roll up the statements added to the store since the last update.
+
+        Stored statements are keyed by their content hash. Returns how many
+        statements were rolled up.
+        """
+        row = self.connection.execute(
+            "SELECT last_statement_id FROM rollup_state"
+        ).fetchone()
+        new_statements = self.connection.execute(
+            "SELECT id, content_hash FROM statements WHERE id > ? ORDER BY id",
+            (-1 if row is None else row[0],),
+        ).fetchall()
+        if not new_statements:
+            return 0
+
+        with self.connection:
+            for _, content_hash in new_statements:
+                statement = self.store.get(content_hash)
+                assert statement
+                self._add(content_hash, statement)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO rollup_state (id, last_statement_id) "
+                "VALUES (0, ?)",
+                (new_statements[-1][0],),
+            )
+
+        return len(new_statements)
+
+    def month(self, year: int, month: int) -> MonthlyTotals:
+        """Totals of the month, zero if nothing was rolled up for it"""
+        return self._load_month(f"{year:04d}-{month:02d}") or MonthlyTotals()
+
+    def months(self, year: int) -> list[tuple[int, MonthlyTotals]]:
+        """(month, totals) of the months of `year` with statements"""
+        rows = self.connection.execute(
+            "SELECT month, totals FROM monthly_rollups "
+            "WHERE month >= ? AND month <= ? ORDER BY month",
+            (f"{year:04d}-01", f"{year:04d}-12"),
+        )
+        return [(int(month[5:]), _load_totals(totals)) for month, totals in rows]
+
+    def year_to_date(self, year: int, month: int = 12) -> MonthlyTotals:
+        """Totals from the start of `year` up to the end of `month`"""
+        totals = MonthlyTotals()
+        for totals_month, month_totals in self.months(year):
+            if totals_month <= month:
+                totals.add(month_totals)
+        return totals
+
+    def _add(self, key: str, statement: BrokerageStatement) -> bool:
+        """Roll up a statement, returns whether it replaced another"""
+        previous = self.connection.execute(
+            "SELECT month, totals FROM rollup_statements WHERE key = ?", (key,)
+        ).fetchone()
+        if previous is not None:
+            self._add_to_month(previous[0], _load_totals(previous[1]), -1)
+
+        month = f"{statement.statement_date:%Y-%m}"
+        totals = statement_totals(statement)
+        self._add_to_month(month, totals)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO rollup_statements (key, month, totals) "
+            "VALUES (?, ?, ?)",
+            (key, month, _dump_totals(totals)),
+        )
+        return previous is not None
+
+    def _add_to_month(self, month: str, totals: MonthlyTotals, sign: int = 1) -> None:
+        month_totals = self._load_month(month) or MonthlyTotals()
+        month_totals.add(totals, sign)
+        if month_totals.statements:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO monthly_rollups (month, totals) VALUES (?, ?)",
+                (month, _dump_totals(month_totals)),
+            )
+        else:
+            self.connection.execute(
+                "DELETE FROM monthly_rollups WHERE month = ?", (month,)
+            )
+
+    def _load_month(self, month: str) -> MonthlyTotals | None:
+        row = self.connection.execute(
+            "SELECT totals FROM monthly_rollups WHERE month = ?", (month,)
+        ).fetchone()
+        return None if row is None else _load_totals(row[0])
+
+
+_TOTALS_DECIMALS = serialization.decimal_fields(MonthlyTotals)
+
+
+def _dump_totals(totals: MonthlyTotals) -> str:
+    return serialization.dumps(totals.dict())
+
+
+def _load_totals(serialized: str) -> MonthlyTotals:
+    return MonthlyTotals.construct(**serialization.loads(serialized, _TOTALS_DECIMALS))
@@ -0,0 +1,46 @@
+"""JSON that keeps the exact value of Decimals.
+
+Decimals are written as strings: as floats, which is how pydantic encodes
+them, they would lose their decimal places. They are read back by the name
+of the fields holding them.
+"""
+import json
+from decimal import Decimal
+from typing import Any, Callable, Iterable
+
+from pydantic import BaseModel
+from pydantic.json import pydantic_encoder
+
+
+def json_encoder(value: Any) -> Any:
+    """`default` of `json.dumps`, Decimals as strings"""
+    if isinstance(value, Decimal):
+        return str(value)
+    return pydantic_encoder(value)
+
+
+def decimal_hook(fields: Iterable[str]) -> Callable[[dict], dict]:
+    """`object_hook` of `json.loads`, turning `fields` back into Decimals"""
+    fields = frozenset(fields)
+
+    def hook(obj: dict) -> dict:
+        for field in fields.intersection(obj):
+            if isinstance(obj[field], str):
+                obj[field] = Decimal(obj[field])
+        return obj
+
+    return hook
+
+
+def decimal_fields(model: type[BaseModel]) -> list[str]:
+    """Names of the Decimal fields of `model`"""
+    return [name for name, field in model.__fields__.items() if field.type_ is Decimal]
+
+
+def dumps(value: Any, **kwargs) -> str:
+    return json.dumps(value, default=json_encoder, **kwargs)
+
+
+def loads(serialized: str | bytes, fields: Iterable[str] = ()) -> Any:
+    """Read JSON written by `dumps`, with Decimals in the objects' `fields`"""
+    return json.loads(serialized, object_hook=decimal_hook(fields))
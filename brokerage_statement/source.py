@@ -0,0 +1,50 @@
+"""PDF input, without copying the files into memory.
+
+A PDF can be given as its path, its bytes or a seekable binary file. Paths
+are memory-mapped read only: hashing the file and decoding it with pdfminer
+both read straight from the page cache, and nothing is left in memory once
+the mapping is closed.
+"""
+import mmap
+import os
+from contextlib import contextmanager
+from io import BytesIO
+from typing import BinaryIO, Iterator, cast
+
+PDFSource = bytes | str | os.PathLike | BinaryIO
+# Contents of a PDF file, as accepted by hashlib
+Buffer = bytes | memoryview | mmap.mmap
+
+
+@contextmanager
+def open_pdf(source: PDFSource) -> Iterator[BinaryIO]:
+    """A seekable binary file over `source`, valid until the context exits"""
+    if isinstance(source, bytes):
+        yield BytesIO(source)
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file, _map(file) as mapped:
+            yield mapped
+    else:
+        source.seek(0)
+        yield source
+
+
+def contents(pdf_file: BinaryIO) -> Buffer:
+    """Everything in a file given by `open_pdf`, without copying it if mapped"""
+    if isinstance(pdf_file, mmap.mmap):
+        return pdf_file
+    if isinstance(pdf_file, BytesIO):
+        return pdf_file.getbuffer()
+
+    pdf_file.seek(0)
+    return pdf_file.read()
+
+
+def _map(file: BinaryIO) -> BinaryIO:
+    try:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Empty files can not be mapped
+        return BytesIO()
+    # Reads, seeks and tells like a binary file
+    return cast(BinaryIO, mapped)
@@ -0,0 +1,351 @@
+"""SQLite storage of parsed statements.
+
+Statements are keyed by the hash of their PDF file, so ingesting a file that
+is already stored is a no-op that does not even parse it. Decimals are kept
+as text, to keep their exact value, and dates as ISO 8601 text, which sorts
+chronologically.
+"""
+import hashlib
+import sqlite3
+from datetime import datetime
+from decimal import Decimal
+from itertools import groupby
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from pydantic import BaseModel
+
+from brokerage_statement.batch import BatchResult, parse_batch
+from brokerage_statement.cache import StatementCache
+from brokerage_statement.models import (
+    BrokerageStatement,
+    BusinessSummary,
+    FinancialSummary,
+    OperationType,
+    StatementItem,
+)
+from brokerage_statement.source import Buffer, contents, open_pdf
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS statements (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL UNIQUE,
+    source TEXT,
+    statement_date TEXT NOT NULL,
+    net_price TEXT NOT NULL,
+    operations_net_value TEXT NOT NULL,
+    settlement_fee TEXT NOT NULL,
+    exchange_fees TEXT NOT NULL,
+    tax_over_service TEXT NOT NULL,
+    brokerage_fee TEXT NOT NULL,
+    operations_total_amount TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS statements_date ON statements (statement_date);
+
+CREATE TABLE IF NOT EXISTS items (
+    statement_id INTEGER NOT NULL REFERENCES statements (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    -- Same as the statement's, for the indexes below
+    statement_date TEXT NOT NULL,
+    security TEXT NOT NULL,
+    operation_type TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    unit_price TEXT NOT NULL,
+    total_price TEXT NOT NULL,
+    PRIMARY KEY (statement_id, position)
+);
+CREATE INDEX IF NOT EXISTS items_security_date ON items (security, statement_date);
+CREATE INDEX IF NOT EXISTS items_date ON items (statement_date);
+"""
+
+_STATEMENT_COLUMNS = (
+    "statement_date, net_price, operations_net_value, settlement_fee, "
+    "exchange_fees, tax_over_service, brokerage_fee, operations_total_amount"
+)
+_ITEM_COLUMNS = (
+    "statement_id, statement_date, operation_type, security, amount, "
+    "unit_price, total_price"
+)
+
+# Statements inserted per transaction when ingesting files
+INGEST_CHUNK_SIZE = 500
+
+
+def content_hash(pdf_file: Buffer) -> str:
+    return hashlib.sha256(pdf_file).hexdigest()
+
+
+class IngestSummary(BaseModel):
+    added: int = 0
+    skipped: int = 0
+    failures: list[BatchResult] = []
+
+
+class StatementStore:
+    """Statements, with their items and summaries, in a SQLite database"""
+
+    def __init__(self, path: Path | str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "StatementStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __contains__(self, content_hash: str) -> bool:
+        row = self.connection.execute(
+            "SELECT 1 FROM statements WHERE content_hash = ?", (content_hash,)
+        ).fetchone()
+        return row is not None
+
+    def add(
+        self,
+        statements: Iterable[tuple[str, BrokerageStatement, str | None]],
+    ) -> int:
+        """Insert (content hash, statement, source) entries in one transaction.
+
+        Entries whose content hash is already stored are ignored, returns how
+        many statements were inserted.
+        """
+        added = 0
+        with self.connection:
+            for entry_hash, statement, source in statements:
+                summary = statement.financial_summary
+                cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO statements "
+                    f"(content_hash, source, {_STATEMENT_COLUMNS}) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        entry_hash,
+                        source,
+                        statement.statement_date.isoformat(),
+                        str(statement.net_price),
+                        str(summary.operations_net_value),
+                        str(summary.settlement_fee),
+                        str(summary.exchange_fees),
+                        str(summary.tax_over_service),
+                        str(summary.brokerage_fee),
+                        str(statement.business_summary.operations_total_amount),
+                    ),
+                )
+                if not cursor.rowcount:
+                    continue
+
+                statement_date = statement.statement_date.isoformat()
+                self.connection.executemany(
+                    f"INSERT INTO items (position, {_ITEM_COLUMNS}) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            position,
+                            cursor.lastrowid,
+                            statement_date,
+                            item.operation_type.value,
+                            item.security,
+                            item.amount,
+                            str(item.unit_price),
+                            str(item.total_price),
+                        )
+                        for position, item in enumerate(statement.items)
+                    ],
+                )
+                added += 1
+
+        return added
+
+    def ingest(
+        self,
+        pdf_paths: Iterable[str],
+        jobs: int = 1,
+        cache: StatementCache | None = None,
+        share_fonts: bool = False,
+        stream: bool = False,
+    ) -> IngestSummary:
+        """Parse and store the PDF files that are not stored yet"""
+        summary = IngestSummary()
+        hashes: dict[str, str] = {}
+        seen: set[str] = set()
+        for pdf_path in pdf_paths:
+            with open_pdf(pdf_path) as pdf_file:
+                pdf_hash = content_hash(contents(pdf_file))
+            if pdf_hash in seen or pdf_hash in self:
+                summary.skipped += 1
+            else:
+                hashes[pdf_path] = pdf_hash
+            seen.add(pdf_hash)
+
+        chunk: list[tuple[str, BrokerageStatement, str | None]] = []
+        for result in parse_batch(
+            hashes, jobs, cache, share_fonts=share_fonts, stream=stream
+        ):
+            if result.failed:
+                summary.failures.append(result)
+                continue
+
+            assert result.statement
+            chunk.append((hashes[result.pdf_path], result.statement, result.pdf_path))
+            if len(chunk) >= INGEST_CHUNK_SIZE:
+                summary.added += self.add(chunk)
+                chunk.clear()
+        summary.added += self.add(chunk)
+
+        return summary
+
+    def get(self, content_hash: str) -> BrokerageStatement | None:
+        row = self.connection.execute(
+            f"SELECT id, {_STATEMENT_COLUMNS} FROM statements WHERE content_hash = ?",
+            (content_hash,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        items = self.connection.execute(
+            f"SELECT {_ITEM_COLUMNS} FROM items WHERE statement_id = ? "
+            "ORDER BY position",
+            (row[0],),
+        )
+        return _build_statement(row, [_build_item(item) for item in items])
+
+    def statements(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> Iterator[BrokerageStatement]:
+        """Statements dated within [start, end], in chronological order"""
+        for _, statement in self.statement_entries(start=start, end=end):
+            yield statement
+
+    def statement_entries(
+        self,
+        after: tuple[datetime, int] | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ) -> Iterator[tuple[int, BrokerageStatement]]:
+        """(id, statement) in chronological order, then in order of insertion.
+
+        With `after`, a (statement date, id) pair, only the statements that
+        come after it in that order.
+        """
+        statement_conditions, params = _date_range(start, end)
+        item_conditions = list(statement_conditions)
+        if after is not None:
+            after_date = after[0].isoformat()
+            statement_conditions.append(
+                "(statement_date > ? OR (statement_date = ? AND id > ?))"
+            )
+            item_conditions.append(
+                "(statement_date > ? OR (statement_date = ? AND statement_id > ?))"
+            )
+            params.extend([after_date, after_date, after[1]])
+
+        statements = self.connection.execute(
+            f"SELECT id, {_STATEMENT_COLUMNS} FROM statements "
+            f"{_where(statement_conditions)} ORDER BY statement_date, id",
+            params,
+        )
+        items = self.connection.execute(
+            f"SELECT {_ITEM_COLUMNS} FROM items {_where(item_conditions)} "
+            "ORDER BY statement_date, statement_id, position",
+            params,
+        )
+        items_by_statement = groupby(items, key=lambda item: item[0])
+
+        next_items = next(items_by_statement, None)
+        for row in statements:
+            statement_items: list[StatementItem] = []
+            if next_items is not None and next_items[0] == row[0]:
+                statement_items = [_build_item(item) for item in next_items[1]]
+                next_items = next(items_by_statement, None)
+            yield row[0], _build_statement(row, statement_items)
+
+    def items(
+        self,
+        security: str | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        operation_type: OperationType | None = None,
+    ) -> Iterator[tuple[datetime, StatementItem]]:
+        """(statement date, item) of the matching items, in chronological order"""
+        conditions, params = _date_range(start, end)
+        if security is not None:
+            conditions.append("security = ?")
+            params.append(security)
+        if operation_type is not None:
+            conditions.append("operation_type = ?")
+            params.append(OperationType(operation_type).value)
+
+        rows = self.connection.execute(
+            f"SELECT {_ITEM_COLUMNS} FROM items {_where(conditions)} "
+            "ORDER BY statement_date, statement_id, position",
+            params,
+        )
+        for row in rows:
+            yield datetime.fromisoformat(row[1]), _build_item(row)
+
+
+def _date_range(
+    start: datetime | None, end: datetime | None
+) -> tuple[list[str], list[str | int]]:
+    conditions: list[str] = []
+    params: list[str | int] = []
+    if start is not None:
+        conditions.append("statement_date >= ?")
+        params.append(start.isoformat())
+    if end is not None:
+        conditions.append("statement_date <= ?")
+        params.append(end.isoformat())
+
+    return conditions, params
+
+
+def _where(conditions: list[str]) -> str:
+    return f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+
+# Rows come from our own tables, so the models are built without validation
+
+
+def _build_item(row: tuple) -> StatementItem:
+    _, _, operation_type, security, amount, unit_price, total_price = row
+    return StatementItem.construct(
+        operation_type=OperationType(operation_type),
+        security=security,
+        amount=amount,
+        unit_price=Decimal(unit_price),
+        total_price=Decimal(total_price),
+    )
+
+
+def _build_statement(row: tuple, items: list[StatementItem]) -> BrokerageStatement:
+    (
+        _,
+        statement_date,
+        net_price,
+        operations_net_value,
+        settlement_fee,
+        exchange_fees,
+        tax_over_service,
+        brokerage_fee,
+        operations_total_amount,
+    ) = row
+    return BrokerageStatement.construct(
+        statement_date=datetime.fromisoformat(statement_date),
+        items=items,
+        financial_summary=FinancialSummary.construct(
+            operations_net_value=Decimal(operations_net_value),
+            settlement_fee=Decimal(settlement_fee),
+            exchange_fees=Decimal(exchange_fees),
+            tax_over_service=Decimal(tax_over_service),
+            brokerage_fee=Decimal(brokerage_fee),
+        ),
+        business_summary=BusinessSummary.construct(
+            operations_total_amount=Decimal(operations_total_amount)
+        ),
+        net_price=Decimal(net_price),
+    )
@@ -0,0 +1,195 @@
+import hashlib
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from functools import partial
+from pathlib import Path
+from typing import Iterator
+
+from pydantic import BaseModel
+
+from brokerage_statement.batch import BatchResult, parse_statement_file
+from brokerage_statement.cache import StatementCache
+
+
+class ProcessedFile(BaseModel):
+    name: str
+    mtime_ns: int
+    size: int
+
+
+def default_state_file(directory: Path | str, cache_dir: Path | str) -> Path:
+    """Journal of the processed files of `directory`, inside the cache dir"""
+    digest = hashlib.sha256(str(Path(directory).resolve()).encode()).hexdigest()
+    return Path(cache_dir) / "watch" / f"{digest[:16]}.jsonl"
+
+
+class DirectoryWatcher:
+    """Parse the PDF files dropped in a directory, as they show up.
+
+    The directory is polled every `interval` seconds. New files, and files
+    whose size or mtime changed, are parsed by up to `jobs` worker processes;
+    files modified less than `settle` seconds ago are left for the next scan,
+    as they may still be being written. At most `max_pending` files are
+    queued on the workers, the scan waits for results beyond that.
+
+    Each processed file is appended to the `state_file` journal once its
+    result has been consumed, so after a restart only the files that are new
+    or changed since then are parsed (and the ones whose result was being
+    emitted when it stopped).
+    """
+
+    def __init__(
+        self,
+        directory: Path | str,
+        state_file: Path | str,
+        jobs: int = 1,
+        cache: StatementCache | None = None,
+        interval: float = 2.0,
+        settle: float = 1.0,
+        max_pending: int | None = None,
+        profile: bool = False,
+        share_fonts: bool = False,
+        stream: bool = False,
+    ):
+        self.directory = Path(directory)
+        self.state_file = Path(state_file)
+        self.jobs = jobs
+        self.interval = interval
+        self.settle = settle
+        self.max_pending = max_pending or 2 * jobs
+        self._parse = partial(
+            parse_statement_file,
+            cache=cache,
+            profile=profile,
+            share_fonts=share_fonts,
+            stream=stream,
+        )
+        self._processed: dict[str, ProcessedFile] = self._load_state()
+
+    def _load_state(self) -> dict[str, ProcessedFile]:
+        processed: dict[str, ProcessedFile] = {}
+        try:
+            with self.state_file.open(encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        entry = ProcessedFile.parse_raw(line)
+                    except ValueError:
+                        # Partially written by a crash
+                        continue
+                    processed[entry.name] = entry
+        except FileNotFoundError:
+            pass
+
+        return processed
+
+    def _record(self, entry: ProcessedFile) -> None:
+        self._processed[entry.name] = entry
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        with self.state_file.open("a", encoding="utf-8") as file:
+            file.write(entry.json() + "\n")
+
+    def compact_state(self) -> None:
+        """Rewrite the journal with one entry per file still in the directory"""
+        names = {entry.name for entry in os.scandir(self.directory)}
+        self._processed = {
+            name: entry for name, entry in self._processed.items() if name in names
+        }
+
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_file.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as file:
+            for entry in self._processed.values():
+                file.write(entry.json() + "\n")
+        os.replace(tmp_path, self.state_file)
+
+    def scan(self) -> list[ProcessedFile]:
+        """PDF files that are new or changed since they were processed"""
+        now = time.time_ns()
+        pending: list[ProcessedFile] = []
+
+        for dir_entry in os.scandir(self.directory):
+            if not dir_entry.name.lower().endswith(".pdf") or not dir_entry.is_file():
+                continue
+
+            stat = dir_entry.stat()
+            entry = ProcessedFile(
+                name=dir_entry.name, mtime_ns=stat.st_mtime_ns, size=stat.st_size
+            )
+            if entry == self._processed.get(entry.name):
+                continue
+            if now - entry.mtime_ns < self.settle * 1e9:
+                continue
+            pending.append(entry)
+
+        return sorted(pending, key=lambda entry: entry.name)
+
+    def run(self, once: bool = False) -> Iterator[BatchResult]:
+        """Yield the result of each file as soon as it is parsed.
+
+        Runs until interrupted, or with `once`, until every file found in the
+        directory has been processed (files still settling are left for the
+        next run).
+        """
+        self.compact_state()
+
+        if self.jobs <= 1:
+            yield from self._run_inline(once)
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=self.jobs, initializer=_ignore_interrupt
+        ) as executor:
+            in_flight: dict[Future, ProcessedFile] = {}
+            try:
+                while True:
+                    running = {entry.name for entry in in_flight.values()}
+                    for entry in self.scan():
+                        if entry.name in running:
+                            continue
+                        # Backpressure: wait for the workers to catch up
+                        if len(in_flight) >= self.max_pending:
+                            yield from self._completed(in_flight, timeout=None)
+                        future = executor.submit(self._parse, self._path(entry))
+                        in_flight[future] = entry
+
+                    if in_flight:
+                        timeout = None if once else self.interval
+                        yield from self._completed(in_flight, timeout)
+                    elif once:
+                        return
+                    else:
+                        time.sleep(self.interval)
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+    def _run_inline(self, once: bool) -> Iterator[BatchResult]:
+        while True:
+            pending = self.scan()
+            for entry in pending:
+                yield self._parse(self._path(entry))
+                self._record(entry)
+
+            if once and not pending:
+                return
+            if not pending:
+                time.sleep(self.interval)
+
+    def _completed(
+        self, in_flight: dict[Future, ProcessedFile], timeout: float | None
+    ) -> Iterator[BatchResult]:
+        done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            entry = in_flight.pop(future)
+            yield future.result()
+            self._record(entry)
+
+    def _path(self, entry: ProcessedFile) -> str:
+        return str(self.directory / entry.name)
+
+
+def _ignore_interrupt() -> None:
+    # Ctrl+C stops the watcher, which then shuts the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
@@ -1,5 +1,17 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Sequence
+
 import pytest
 
+from brokerage_statement.models import (
+    BrokerageStatement,
+    BusinessSummary,
+    FinancialSummary,
+    OperationType,
+    StatementItem,
+)
+
 
 @pytest.fixture
 def open_pdf():
@@ -9,3 +21,57 @@ def open_pdf():
         return pdf_file
 
     return inner
+
+
+@pytest.fixture
+def make_statement():
+    """Builds a statement of (operation type, security, amount, unit price) items.
+
+    Its net values and net price follow from the items and fees, unless given.
+    """
+
+    def inner(
+        day: int = 5,
+        items: Sequence[tuple[OperationType, str, int, str]] = (
+            (OperationType.BUY, "BBAS3", 250, "10.28"),
+        ),
+        settlement_fee: str = "0.64",
+        exchange_fees: str = "0.13",
+        net_price: str | None = None,
+    ) -> BrokerageStatement:
+        statement_items = [
+            StatementItem(
+                operation_type=operation_type,
+                security=security,
+                amount=amount,
+                unit_price=Decimal(unit_price),
+                total_price=(amount * Decimal(unit_price)).quantize(Decimal("0.01")),
+            )
+            for operation_type, security, amount, unit_price in items
+        ]
+        net_value = sum(
+            item.total_price
+            if item.operation_type == OperationType.SELL
+            else -item.total_price
+            for item in statement_items
+        )
+        fees = Decimal(settlement_fee) + Decimal(exchange_fees)
+        return BrokerageStatement(
+            statement_date=datetime(2022, 12, day),
+            items=statement_items,
+            financial_summary=FinancialSummary(
+                operations_net_value=net_value,
+                settlement_fee=Decimal(settlement_fee),
+                exchange_fees=Decimal(exchange_fees),
+                tax_over_service=Decimal("0.00"),
+                brokerage_fee=Decimal("0.00"),
+            ),
+            business_summary=BusinessSummary(
+                operations_total_amount=sum(
+                    item.total_price for item in statement_items
+                )
+            ),
+            net_price=Decimal(net_price) if net_price else net_value - fees,
+        )
+
+    return inner
@@ -0,0 +1,60 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from benchmarks.synthetic import generate_statement
+from brokerage_statement.aggregate import StatementAggregator
+from brokerage_statement.factory import brokerage_statement_factory
+from brokerage_statement.pdf.models import BrokerageStatementPdf
+
+
+def _pdf_statements(count: int):
+    for seed in range(count):
+        yield BrokerageStatementPdf(generate_statement(4, seed=seed))
+
+
+def test_aggregator_totals_per_date():
+    statements = [brokerage_statement_factory([pdf]) for pdf in _pdf_statements(3)]
+    statements[2].statement_date = datetime(2022, 12, 6)
+    statements[2].business_summary.operations_total_amount += 1
+
+    aggregator = StatementAggregator()
+    summaries = list(aggregator.consume(iter(statements)))
+
+    assert [summary.reconciled for summary in summaries] == [True, True, False]
+    assert [statement_date for statement_date, _ in aggregator.dates()] == [
+        date(2022, 12, 5),
+        date(2022, 12, 6),
+    ]
+    first_day = aggregator.dates()[0][1]
+    assert first_day.statements == 2
+    assert first_day.unreconciled == 0
+    assert aggregator.total.statements == 3
+    assert aggregator.total.unreconciled == 1
+    assert aggregator.total.items == 12
+    # Seed 0 is a credit, seeds 1 and 2 are debits
+    assert [stm.net_price for stm in statements] == [
+        Decimal("103041.69"),
+        Decimal("-42304.92"),
+        Decimal("-2630.04"),
+    ]
+    assert aggregator.total.net_price == Decimal("58106.73")
+    assert aggregator.total.sold + aggregator.total.bought == sum(
+        item.total_price for stm in statements for item in stm.items
+    )
+
+
+def test_factory_reconciles_each_file():
+    merged = brokerage_statement_factory(_pdf_statements(3))
+    statements = [brokerage_statement_factory([pdf]) for pdf in _pdf_statements(3)]
+
+    assert len(merged.items) == 12
+    assert merged.statement_date == statements[0].statement_date
+    assert merged.business_summary.operations_total_amount == sum(
+        stm.business_summary.operations_total_amount for stm in statements
+    )
+    assert merged.financial_summary.settlement_fee == sum(
+        (stm.financial_summary.settlement_fee for stm in statements), Decimal(0)
+    )
+    # Debits are taken out of the credits
+    assert merged.financial_summary.operations_net_value == Decimal("58189.00")
+    assert merged.net_price == Decimal("58106.73")
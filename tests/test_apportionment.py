@@ -0,0 +1,14 @@
+from brokerage_statement.report.apportionment import largest_remainder
+
+
+def test_largest_remainder_adds_up_to_total():
+    parts = largest_remainder(513, [4858392, 5079618, 543619, 3325920])
+
+    assert sum(parts) == 513
+    assert parts == [180, 189, 20, 124]
+
+
+def test_largest_remainder_ties_go_to_first_parts():
+    assert largest_remainder(10, [1, 1, 1]) == [4, 3, 3]
+    assert largest_remainder(0, [1, 2]) == [0, 0]
+    assert largest_remainder(5, []) == []
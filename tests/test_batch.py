@@ -0,0 +1,38 @@
+from benchmarks.synthetic import generate_statement
+from brokerage_statement.batch import load_statement, parse_batch
+
+
+def _write_statements(tmp_path, rows: list[int]) -> list[str]:
+    pdf_paths = []
+    for seed, statement_rows in enumerate(rows):
+        pdf_path = tmp_path / f"statement{seed}.pdf"
+        pdf_path.write_bytes(generate_statement(statement_rows, seed=seed))
+        pdf_paths.append(str(pdf_path))
+    return pdf_paths
+
+
+def test_parallel_results_in_argument_order(tmp_path):
+    # The largest statement first, so it is not the first one parsed
+    pdf_paths = _write_statements(tmp_path, [24, 1, 12, 3, 6])
+
+    results = list(parse_batch(pdf_paths, jobs=3))
+
+    assert [result.pdf_path for result in results] == pdf_paths
+    assert [len(result.statement.items) for result in results] == [24, 1, 12, 3, 6]
+    assert [result.statement for result in results] == [
+        load_statement(pdf_path) for pdf_path in pdf_paths
+    ]
+
+
+def test_parallel_failures_do_not_stop_the_batch(tmp_path):
+    pdf_paths = _write_statements(tmp_path, [4, 5])
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"%PDF-1.4 not a statement")
+    pdf_paths.insert(1, str(broken))
+
+    results = list(parse_batch(pdf_paths, jobs=2))
+
+    assert [result.failed for result in results] == [False, True, False]
+    assert results[1].pdf_path == str(broken)
+    assert results[1].statement is None and results[1].error
+    assert [len(results[idx].statement.items) for idx in (0, 2)] == [4, 5]
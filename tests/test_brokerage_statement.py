@@ -1,7 +1,23 @@
+import io
+from datetime import datetime
+
 import pytest
+from pdfminer.high_level import extract_text
 
+from benchmarks.synthetic import generate_statement
+from brokerage_statement import profiling
+from brokerage_statement.batch import parse_batch
 from brokerage_statement.factory import brokerage_statement_factory
+from brokerage_statement.models import OperationType
 from brokerage_statement.pdf.models import BrokerageStatementPdf
+from brokerage_statement.pdf import resources
+from brokerage_statement.pdf.resources import font_key, shared_resources
+from brokerage_statement.pdf.utils import (
+    LayoutTemplate,
+    TextBox,
+    TitleOccurrences,
+    _get_layout_templates,
+)
 
 
 @pytest.mark.skip
@@ -13,3 +29,347 @@ def test_multiple_buys(open_pdf, snapshot):
     brokerage_statement = brokerage_statement_factory(pdf_statement)
 
     snapshot.assert_match(brokerage_statement.json())
+
+
+@pytest.mark.parametrize("rows, pages", [(1, 1), (24, 1), (40, 2)])
+def test_synthetic_statement(rows, pages):
+    pdf_statement = BrokerageStatementPdf(generate_statement(rows, pages, seed=rows))
+
+    brokerage_statement = brokerage_statement_factory([pdf_statement])
+
+    assert len(brokerage_statement.items) == rows
+    assert brokerage_statement.statement_date == datetime(2022, 12, 5)
+    # Fees are debited from the (signed) net value of the operations
+    assert brokerage_statement.net_price == (
+        brokerage_statement.financial_summary.operations_net_value
+        - brokerage_statement.financial_summary.settlement_fee
+        - brokerage_statement.financial_summary.exchange_fees
+    )
+
+
+@pytest.mark.parametrize("pages", [1, 2])
+def test_stream_stops_decoding_after_the_statement(pages):
+    pdf_file = generate_statement(20 * pages, pages, trailing_pages=5, seed=pages)
+
+    with profiling.profile() as eager_profile:
+        eager = BrokerageStatementPdf(pdf_file)
+    with profiling.profile() as stream_profile:
+        streamed = BrokerageStatementPdf(pdf_file, stream=True)
+
+    assert eager_profile.counters["pages_decoded"] == pages + 5
+    # The boxes spanning pages end on the first page without their titles
+    assert stream_profile.counters["pages_decoded"] == pages + 1
+    assert brokerage_statement_factory([streamed]) == brokerage_statement_factory(
+        [eager]
+    )
+
+
+def test_batch_streams_the_files(tmp_path):
+    pdf_path = tmp_path / "statement.pdf"
+    pdf_path.write_bytes(generate_statement(5, trailing_pages=3))
+
+    eager, streamed = [
+        next(parse_batch([str(pdf_path)], profile=True, stream=stream))
+        for stream in (False, True)
+    ]
+
+    assert eager.profile and streamed.profile
+    assert eager.profile.counters["pages_decoded"] == 4
+    assert streamed.profile.counters["pages_decoded"] == 2
+    assert streamed.statement == eager.statement
+
+
+def test_lazy_document_loads_the_boxes_read():
+    pdf_file = generate_statement(10, seed=5)
+    eager = BrokerageStatementPdf(pdf_file)
+    lazy = BrokerageStatementPdf(pdf_file, lazy=True)
+
+    def loaded() -> set[str]:
+        return {
+            name
+            for name in BrokerageStatementPdf.__fields__
+            if isinstance(lazy.__dict__.get(name), TextBox)
+            and lazy.__dict__[name].content is not None
+        }
+
+    assert loaded() == set()
+    assert lazy.statement_date.content == eager.statement_date.content
+    assert loaded() == {"statement_date"}
+
+    lazy.load_fields()
+    assert loaded() == set(BrokerageStatementPdf.__fields__) - {"pdf_pages"}
+    for name in loaded():
+        assert getattr(lazy, name).content == getattr(eager, name).content
+    assert brokerage_statement_factory([lazy]) == brokerage_statement_factory([eager])
+
+
+def test_pdf_lines_one_per_text_line():
+    pdf_statement = BrokerageStatementPdf(generate_statement(1, seed=0))
+
+    assert pdf_statement.pdf_lines == [
+        "NOTA DE NEGOCIAÇÃO",
+        "Nr. nota 100000   Folha 1",
+        "Data pregão: 05/12/2022",
+        "Negócios realizados",
+        "C/V",
+        "Especificação do Título",
+        "Quantidade",
+        "Preço Liquidação (R$)",
+        "Compra/Venda (R$)",
+        "V",
+        "PETR4 ON NM",
+        "433",
+        "127,23",
+        "55.090,59",
+        "Debêntures",
+        "0,00",
+        "Valor Líquido das Operações(1)",
+        "55.090,59 C",
+        "Vendas à vista",
+        "55.090,59",
+        "Taxa de Liquidação(2)",
+        "13,77 D",
+        "Compras à vista",
+        "0,00",
+        "Taxa de Registro(3)",
+        "0,00 C",
+        "Opções - compras",
+        "0,00",
+        "Emolumentos",
+        "2,75 D",
+        "Opções - vendas",
+        "0,00",
+        "Corretagem",
+        "0,00 C",
+        "Operações à termo",
+        "0,00",
+        "ISS",
+        "0,00 C",
+        "Valor das oper. c/ títulos",
+        "0,00",
+        "Outras",
+        "0,00 C",
+        "Valor das Operações",
+        "55.090,59",
+        "Liquido para 07/12/2022",
+        "55.074,07 C",
+        "\f",
+    ]
+
+
+@pytest.mark.parametrize("rows, pages, trailing_pages", [(1, 1, 0), (30, 2, 1)])
+def test_layout_pdf_lines_match_extract_text(rows, pages, trailing_pages, monkeypatch):
+    pdf_file = generate_statement(rows, pages, trailing_pages, seed=rows)
+    monkeypatch.setattr(BrokerageStatementPdf, "layout_analysis", True)
+    pdf_statement = BrokerageStatementPdf(pdf_file)
+
+    assert pdf_statement.pdf_lines == extract_text(io.BytesIO(pdf_file)).split("\n")
+
+
+def test_trusted_construction_matches_validated():
+    pdf_statement = BrokerageStatementPdf(generate_statement(30, 2, seed=7))
+
+    trusted = brokerage_statement_factory([pdf_statement])
+    validated = brokerage_statement_factory([pdf_statement], validate=True)
+
+    assert trusted == validated
+    assert trusted.json() == validated.json()
+    assert trusted.sold_items() == validated.sold_items()
+    assert len(trusted.sold_items()) + len(trusted.bought_items()) == 30
+
+
+def test_item_partitions_follow_items():
+    brokerage_statement = brokerage_statement_factory(
+        [BrokerageStatementPdf(generate_statement(6, seed=2))]
+    )
+    sold = brokerage_statement.sold_items()
+    bought = brokerage_statement.bought_items()
+
+    brokerage_statement.items.append(sold[0])
+    assert len(brokerage_statement.sold_items()) == len(sold) + 1
+
+    brokerage_statement.items[-1] = bought[0]
+    assert brokerage_statement.sold_items() == sold
+
+    sold[0].operation_type = OperationType.BUY
+    assert brokerage_statement.sold_items() == sold[1:]
+    assert len(brokerage_statement.bought_items()) == len(bought) + 2
+
+    brokerage_statement.items = bought
+    assert brokerage_statement.sold_items() == []
+
+
+@pytest.mark.parametrize("rows, pages", [(3, 1), (40, 2)])
+def test_glyph_extraction_matches_layout_analysis(rows, pages, monkeypatch):
+    pdf_file = generate_statement(rows, pages, seed=rows)
+    pdf_statement = BrokerageStatementPdf(pdf_file)
+    monkeypatch.setattr(BrokerageStatementPdf, "layout_analysis", True)
+    layout_statement = BrokerageStatementPdf(pdf_file)
+
+    for field in ("security_name", "security_amount", "operation_type"):
+        assert (
+            getattr(pdf_statement, field).content
+            == getattr(layout_statement, field).content
+        )
+    assert brokerage_statement_factory([pdf_statement]) == brokerage_statement_factory(
+        [layout_statement]
+    )
+
+
+def test_layout_template_skips_title_search(monkeypatch):
+    templates = _get_layout_templates(BrokerageStatementPdf)
+    templates.clear()
+    first = BrokerageStatementPdf(generate_statement(5, seed=1))
+    assert len(templates) == 1
+
+    with profiling.profile() as profile:
+        second = BrokerageStatementPdf(generate_statement(8, seed=2))
+    assert profile.counters["template_hits"] == 1
+    assert "template_misses" not in profile.counters
+
+    monkeypatch.setattr(BrokerageStatementPdf, "layout_templates", False)
+    searched = BrokerageStatementPdf(generate_statement(8, seed=2))
+    assert first.security_name.content != second.security_name.content
+    assert second.security_name.content == searched.security_name.content
+    assert brokerage_statement_factory([second]) == brokerage_statement_factory(
+        [searched]
+    )
+
+
+def test_layout_template_falls_back_when_titles_moved():
+    pdf_file = generate_statement(5, seed=1)
+    templates = _get_layout_templates(BrokerageStatementPdf)
+    templates.clear()
+    learned = BrokerageStatementPdf(pdf_file)
+    (fingerprint,) = templates._templates
+    moved = TitleOccurrences(
+        {
+            title: [occurrence.copy(update={"top": occurrence.top - 9.0})]
+            for title, (occurrence, *_) in learned._title_occurrences.items()
+        }
+    )
+    templates.add(fingerprint, LayoutTemplate(moved))
+
+    with profiling.profile() as profile:
+        pdf_statement = BrokerageStatementPdf(pdf_file)
+    assert profile.counters["template_misses"] == 1
+
+    assert brokerage_statement_factory([pdf_statement]) == (
+        brokerage_statement_factory([learned])
+    )
+    assert templates.get(fingerprint).title_occurrences is not moved
+
+
+def test_layout_template_of_a_shorter_table():
+    pdf_file = generate_statement(40, 2, seed=4)
+    templates = _get_layout_templates(BrokerageStatementPdf)
+    templates.clear()
+    learned = BrokerageStatementPdf(pdf_file)
+    (fingerprint,) = templates._templates
+    span_titles = [
+        title
+        for title, span_pages in BrokerageStatementPdf.extraction_plan.field_titles
+        if span_pages
+    ]
+    # As learned from a statement whose table ends on its first page
+    shorter = TitleOccurrences(
+        {
+            title: [
+                occurrence
+                for occurrence in occurrences
+                if title not in span_titles or occurrence.page_index == 0
+            ]
+            for title, occurrences in learned._title_occurrences.items()
+        }
+    )
+    templates.add(fingerprint, LayoutTemplate(shorter, span_titles))
+
+    with profiling.profile() as profile:
+        pdf_statement = BrokerageStatementPdf(pdf_file)
+    assert profile.counters["template_misses"] == 1
+
+    assert len(pdf_statement.securities_table) == len(learned.securities_table)
+    assert brokerage_statement_factory([pdf_statement]) == (
+        brokerage_statement_factory([learned])
+    )
+
+
+def test_statement_from_path_matches_bytes(tmp_path):
+    pdf_file = generate_statement(12, seed=4)
+    pdf_path = tmp_path / "statement.pdf"
+    pdf_path.write_bytes(pdf_file)
+
+    from_path = BrokerageStatementPdf(pdf_path)
+    with open(pdf_path, "rb") as file:
+        from_file = BrokerageStatementPdf(file)
+
+    expected = brokerage_statement_factory([BrokerageStatementPdf(pdf_file)])
+    assert brokerage_statement_factory([from_path]) == expected
+    assert brokerage_statement_factory([from_file]) == expected
+
+
+def test_shared_fonts_are_decoded_once_per_definition():
+    pdf_files = [
+        generate_statement(6, seed=1, font_data=True),
+        generate_statement(9, seed=2, font_data=True),
+        generate_statement(9, seed=2),
+    ]
+    expected = [
+        brokerage_statement_factory([BrokerageStatementPdf(pdf_file)])
+        for pdf_file in pdf_files
+    ]
+
+    with shared_resources() as fonts, profiling.profile() as profile:
+        fonts.clear()
+        statements = [
+            brokerage_statement_factory([BrokerageStatementPdf(pdf_file)])
+            for pdf_file in pdf_files
+        ]
+
+    assert statements == expected
+    # The standard font is a different definition from the one with font data
+    assert profile.counters["font_misses"] == 2
+    assert profile.counters["font_hits"] == 1
+    assert len(fonts) == 2
+
+
+def test_shared_fonts_are_digested_once_per_document(monkeypatch):
+    pdf_files = [
+        generate_statement(40, 2, seed=seed, font_data=True) for seed in (1, 2)
+    ]
+    digested = []
+    monkeypatch.setattr(
+        resources, "font_key", lambda spec: digested.append(spec) or font_key(spec)
+    )
+
+    with shared_resources() as fonts, profiling.profile() as profile:
+        fonts.clear()
+        for pdf_file in pdf_files:
+            BrokerageStatementPdf(pdf_file)
+
+    assert profile.counters["pages_decoded"] == 4
+    # Once per document, the next pages use the font of the first one
+    assert len(digested) == 2
+    assert profile.counters["font_hits"] == profile.counters["font_misses"] == 1
+
+
+def test_documents_load_their_own_boxes():
+    plan = BrokerageStatementPdf.extraction_plan
+    summary_plan = plan.boxes["financial_summary"]
+    assert [child.name for child in summary_plan.children] == ["description", "amount"]
+    # Children boxes are as tall as their parent
+    assert summary_plan.children[0].layout.height_scale == 20.0
+
+    first = BrokerageStatementPdf(generate_statement(5, seed=1))
+    second = BrokerageStatementPdf(generate_statement(9, seed=2))
+
+    assert first.financial_summary is not second.financial_summary
+    assert first.financial_summary.description.parent_name == (
+        "Valor Líquido das Operações(1)"
+    )
+    defaults = BrokerageStatementPdf.__fields__["financial_summary"].default
+    assert defaults.content is None
+    assert defaults.description.content is None
+    assert defaults.description.height_scale == 1.0
+    with pytest.raises(TypeError):
+        first.security_name.content = ""
@@ -0,0 +1,60 @@
+import os
+
+from brokerage_statement.cache import StatementCache
+
+
+def test_cache_round_trip_keeps_decimal_places(tmp_path, make_statement):
+    cache = StatementCache(tmp_path)
+    key = cache.key(b"%PDF-1.4 statement")
+
+    assert cache.get(key) is None
+
+    cache.put(key, make_statement())
+    cached = cache.get(key)
+
+    assert cached == make_statement()
+    assert str(cached.items[0].total_price) == "2570.00"
+
+
+def test_cache_evicts_least_recently_used(tmp_path, make_statement):
+    cache = StatementCache(tmp_path)
+    keys = [cache.key(bytes([idx])) for idx in range(3)]
+    for key in keys:
+        cache.put(key, make_statement())
+
+    entry_size = next(tmp_path.glob("*/*.json")).stat().st_size
+    cache.max_size = entry_size * 2
+    # Written in order, then the first one is read again
+    for idx, key in enumerate(keys):
+        os.utime(tmp_path / key[:2] / f"{key}.json", (idx, idx))
+    cache.get(keys[0])
+
+    cache.evict()
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is not None
+
+
+def test_cache_tracks_its_size_on_put(tmp_path, monkeypatch, make_statement):
+    cache = StatementCache(tmp_path)
+    keys = [cache.key(bytes([idx])) for idx in range(4)]
+    # Without a total size yet, the entries are listed once
+    cache.put(keys[0], make_statement())
+    entry_size = next(tmp_path.glob("*/*.json")).stat().st_size
+
+    evictions = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, "evict", lambda: evictions.append(evict()))
+    cache.put(keys[1], make_statement())
+    assert evictions == []
+    assert (tmp_path / "size").read_text() == str(entry_size * 2)
+
+    cache.max_size = entry_size * 2
+    for idx, key in enumerate(keys[:2]):
+        os.utime(tmp_path / key[:2] / f"{key}.json", (idx, idx))
+    cache.put(keys[2], make_statement())
+    assert len(evictions) == 1
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]) is not None and cache.get(keys[2]) is not None
+    assert (tmp_path / "size").read_text() == str(entry_size * 2)
@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from brokerage_statement.export import (
+    ColumnarExporter,
+    CsvExporter,
+    JsonlExporter,
+    read_columnar,
+)
+from brokerage_statement.models import OperationType
+
+
+ITEMS = [
+    (OperationType.BUY, "BBAS3", 250, "10.28"),
+    (OperationType.SELL, "ITSA4", 100, "8.75"),
+]
+
+
+@pytest.fixture
+def _statement(make_statement):
+    def inner(day: int):
+        return make_statement(day, ITEMS, settlement_fee="0.86", exchange_fees="0.17")
+
+    return inner
+
+
+def test_text_exports_one_row_per_item(_statement):
+    csv_file, jsonl_file = io.StringIO(), io.StringIO()
+    for exporter in (CsvExporter(csv_file), JsonlExporter(jsonl_file)):
+        exporter.write_statement(_statement(5), "a.pdf")
+        exporter.write_statement(_statement(6), "b.pdf")
+        assert exporter.rows == 4
+
+    csv_rows = list(csv.DictReader(io.StringIO(csv_file.getvalue())))
+    jsonl_rows = [json.loads(line) for line in jsonl_file.getvalue().splitlines()]
+
+    assert [row["source"] for row in csv_rows] == ["a.pdf", "a.pdf", "b.pdf", "b.pdf"]
+    assert csv_rows[0]["statement_date"] == "2022-12-05"
+    assert [row["settlement_fee"] for row in csv_rows[:2]] == ["0.64", "0.22"]
+    assert csv_rows[1]["net_price"] == "-1696.03"
+    assert jsonl_rows[3] == {**csv_rows[3], "amount": 100}
+
+
+def test_columnar_round_trip(_statement):
+    file = io.BytesIO()
+    exporter = ColumnarExporter(file)
+    exporter.write_statement(_statement(5), "a.pdf")
+    exporter.write_statement(_statement(6), "b.pdf")
+
+    file.seek(0)
+    groups = list(read_columnar(file))
+
+    assert len(groups) == 2
+    assert groups[1]["statement_date"] == [date(2022, 12, 6)] * 2
+    assert groups[1]["security"] == ["BBAS3", "ITSA4"]
+    assert groups[1]["amount"] == [250, 100]
+    assert groups[0]["total_with_fees"] == [Decimal("2570.77"), Decimal("875.26")]
+    assert groups[0]["net_price"] == [Decimal("-1696.03")] * 2
+
+
+def test_columnar_keeps_every_decimal_place(_statement):
+    statement = _statement(7)
+    statement.items[0].unit_price = Decimal("10.2813")
+    statement.items[1].unit_price = Decimal("8.755")
+
+    file = io.BytesIO()
+    exporter = ColumnarExporter(file)
+    exporter.write_statement(_statement(5))
+    exporter.write_statement(statement)
+
+    file.seek(0)
+    groups = list(read_columnar(file))
+
+    assert groups[0]["unit_price"] == [Decimal("10.28"), Decimal("8.75")]
+    assert groups[1]["unit_price"] == [Decimal("10.2813"), Decimal("8.755")]
+    assert groups[1]["total_price"] == [Decimal("2570.00"), Decimal("875.00")]
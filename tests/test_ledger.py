@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from benchmarks.synthetic import generate_statement
+from brokerage_statement import profiling
+from brokerage_statement.factory import brokerage_statement_factory
+from brokerage_statement.ledger import Position, PositionLedger, apply_statement
+from brokerage_statement.pdf.models import BrokerageStatementPdf
+from brokerage_statement.store import StatementStore
+
+
+def _statements(count: int):
+    statements = []
+    for seed in range(count):
+        pdf_statement = BrokerageStatementPdf(generate_statement(6, seed=seed))
+        statement = brokerage_statement_factory([pdf_statement])
+        statement.statement_date += timedelta(days=seed)
+        statements.append(statement)
+    return statements
+
+
+def _replayed(func) -> int:
+    with profiling.profile() as profile:
+        func()
+    return profile.counters.get("ledger_replayed", 0)
+
+
+def test_position_average_cost():
+    position = Position(security="BBAS3")
+    position.trade(10, Decimal("100"))
+    position.trade(10, Decimal("140"))
+    assert position.average_cost == Decimal("12")
+
+    position.trade(-5, Decimal("-80"))
+    assert (position.amount, position.cost) == (15, Decimal("180"))
+    assert position.realized == Decimal("20")
+
+    # Sells more than it has: closes the position, then goes short
+    position.trade(-20, Decimal("-200"))
+    assert (position.amount, position.cost) == (-5, Decimal("-50"))
+    assert position.realized == Decimal("20") + Decimal("150") - Decimal("180")
+
+
+def test_ledger_replays_only_from_snapshots(tmp_path):
+    statements = _statements(10)
+    expected: dict[str, Position] = {}
+    for statement in statements:
+        apply_statement(expected, statement)
+
+    with StatementStore(tmp_path / "statements.db") as store:
+        ledger = PositionLedger(store, snapshot_every=3)
+        # Statement 4 shows up last
+        for index in [0, 1, 2, 3, 5, 6, 7, 8, 9]:
+            added = _replayed(
+                lambda: ledger.add([(str(index), statements[index], None)])
+            )
+            assert added == 1
+
+        # Replays 3 to 9, from the snapshot taken after statement 2
+        assert _replayed(lambda: ledger.add([("4", statements[4], None)])) == 7
+        assert ledger.positions() == expected
+
+        # A new process starts from the last snapshot
+        restarted = PositionLedger(store, snapshot_every=3)
+        assert _replayed(restarted.update) == 1
+        assert restarted.positions() == expected
+
+        as_of = statements[0].statement_date
+        partial: dict[str, Position] = {}
+        apply_statement(partial, statements[0])
+        assert restarted.positions(as_of=as_of) == partial
+        assert restarted.positions(as_of=datetime(2000, 1, 1)) == {}
+
+
+def test_ledgers_sharing_a_store(tmp_path):
+    statements = _statements(4)
+    expected: dict[str, Position] = {}
+    for statement in statements:
+        apply_statement(expected, statement)
+
+    with StatementStore(tmp_path / "statements.db") as store:
+        first = PositionLedger(store, snapshot_every=1)
+        second = PositionLedger(store, snapshot_every=1)
+        first.add([(str(index), statements[index], None) for index in (0, 1)])
+        # Statement 2 is added by the other ledger, dated before its snapshots
+        second.add([(str(index), statements[index], None) for index in (3, 2)])
+
+        assert second.positions() == expected
+        assert _replayed(first.update) == 2
+        assert first.positions() == expected
+
+        # A new ledger skips the snapshots taken before statement 2 was added
+        assert PositionLedger(store).positions() == expected
@@ -0,0 +1,41 @@
+from benchmarks.synthetic import generate_statement
+from brokerage_statement import profiling
+from brokerage_statement.factory import brokerage_statement_factory
+from brokerage_statement.pdf.models import BrokerageStatementPdf
+
+
+def _parse(pdf_file: bytes) -> None:
+    brokerage_statement_factory([BrokerageStatementPdf(pdf_file)])
+
+
+def test_profile_collects_stages_and_counters():
+    pdf_file = generate_statement(rows=5, pages=1, seed=3)
+
+    with profiling.profile() as profile:
+        _parse(pdf_file)
+    # Not collected anymore
+    _parse(pdf_file)
+
+    assert profile.documents == 1
+    assert {"decode", "title_search", "box_filtering", "line_breaks", "factory"} <= (
+        profile.stages.keys()
+    )
+    assert profile.counters["pages_decoded"] == 1
+    assert profile.counters["rows_parsed"] == 5
+    assert profile.counters["rows_skipped"] == 1
+    assert profile.counters["chars_kept.Quantidade"] > 0
+
+
+def test_profile_report_aggregates_documents():
+    report = profiling.ProfileReport()
+    for seed in range(2):
+        with profiling.profile() as profile:
+            _parse(generate_statement(rows=4, pages=1, seed=seed))
+        report.add(f"{seed}.pdf", profile)
+
+    assert list(report.documents) == ["0.pdf", "1.pdf"]
+    assert report.total.documents == 2
+    assert report.total.counters["rows_parsed"] == 8
+    assert report.total.stages["decode"] == sum(
+        profile.stages["decode"] for profile in report.documents.values()
+    )
@@ -0,0 +1,142 @@
+from datetime import datetime
+from decimal import Decimal
+
+from benchmarks.synthetic import generate_statement
+from brokerage_statement.factory import brokerage_statement_factory
+from brokerage_statement.pdf.models import BrokerageStatementPdf
+from brokerage_statement.report.apportionment import apportion_fees
+from brokerage_statement.ledger import PositionLedger, apply_statement
+from brokerage_statement.models import OperationType
+from brokerage_statement.rollup import (
+    MonthlyRollups,
+    MonthlyTotals,
+    is_stock,
+    realized_profit,
+    statement_totals,
+)
+from brokerage_statement.store import StatementStore
+
+
+def _statement(seed: int, statement_date: datetime):
+    pdf_statement = BrokerageStatementPdf(generate_statement(5, seed=seed))
+    statement = brokerage_statement_factory([pdf_statement])
+    statement.statement_date = statement_date
+    return statement
+
+
+def test_statement_totals_split_fees_as_the_report():
+    statement = _statement(0, datetime(2022, 12, 5))
+    totals = statement_totals(statement)
+    fees = apportion_fees([statement])
+
+    assert totals.sold + totals.bought == sum(
+        item.total_price for item in statement.items
+    )
+    assert totals.sold + totals.bought + totals.sold_fees + totals.bought_fees == sum(
+        fees.total_with_fees
+    )
+    assert totals.net_price == statement.net_price
+
+
+def test_rollups_replace_statements_by_key(tmp_path):
+    january = _statement(1, datetime(2023, 1, 10))
+    february = _statement(2, datetime(2023, 2, 3))
+    corrected = _statement(3, datetime(2023, 3, 1))
+
+    with StatementStore(tmp_path / "statements.db") as store:
+        rollups = MonthlyRollups(store)
+        assert rollups.add([("a", january), ("b", february)]) == 0
+        assert rollups.month(2023, 1) == statement_totals(january)
+        assert rollups.year_to_date(2023, 1) == statement_totals(january)
+
+        # "b" was dated in the wrong month
+        assert rollups.add([("b", corrected)]) == 1
+        assert rollups.month(2023, 2) == MonthlyTotals()
+        assert [month for month, _ in rollups.months(2023)] == [1, 3]
+
+        expected = statement_totals(january)
+        expected.add(statement_totals(corrected))
+        assert rollups.year_to_date(2023) == expected
+        assert rollups.year_to_date(2023).statements == 2
+        assert rollups.year_to_date(2023, 2) == statement_totals(january)
+
+
+def test_rollups_follow_the_store(tmp_path):
+    statements = [_statement(seed, datetime(2023, 4, 1 + seed)) for seed in range(3)]
+
+    with StatementStore(tmp_path / "statements.db") as store:
+        store.add([(f"hash{idx}", stm, None) for idx, stm in enumerate(statements[:2])])
+        rollups = MonthlyRollups(store)
+        assert rollups.update() == 2
+
+        store.add([("hash2", statements[2], None)])
+        assert rollups.update() == 1
+        assert rollups.update() == 0
+
+    with StatementStore(tmp_path / "statements.db") as store:
+        april = MonthlyRollups(store).month(2023, 4)
+
+    expected = MonthlyTotals()
+    for statement in statements:
+        expected.add(statement_totals(statement))
+    assert april == expected
+
+
+def test_net_price_of_debits_and_credits(tmp_path):
+    # Seed 0 is a credit, seeds 1 and 2 are debits
+    statements = [_statement(seed, datetime(2023, 5, 2 + seed)) for seed in range(3)]
+    assert statements[0].net_price > 0 > statements[1].net_price
+
+    with StatementStore(tmp_path / "statements.db") as store:
+        rollups = MonthlyRollups(store)
+        rollups.add([(str(seed), stm) for seed, stm in enumerate(statements)])
+        may = rollups.month(2023, 5)
+
+    assert may.net_price == sum(statement.net_price for statement in statements)
+
+
+def test_sales_exemption_counts_only_stocks():
+    assert is_stock("PETR4") and is_stock("VALE3") and is_stock("PETR4F")
+    assert not is_stock("BOVA11") and not is_stock("HGLG11")
+
+    statement = _statement(0, datetime(2023, 6, 1))
+    totals = statement_totals(statement)
+    assert totals.stocks_sold == sum(
+        item.total_price
+        for item in statement.items
+        if item.operation_type == OperationType.SELL and item.security != "BOVA11"
+    )
+
+    assert MonthlyTotals(stocks_sold=Decimal(20000)).stock_sales_exempt
+    assert not MonthlyTotals(stocks_sold=Decimal("20000.01")).stock_sales_exempt
+    # Sales of ETFs and FIIs do not count towards the limit
+    assert MonthlyTotals(sold=Decimal(50000)).stock_sales_exempt
+
+
+def test_realized_profit_of_a_month(tmp_path):
+    dates = [
+        datetime(2022, 12, 20),
+        datetime(2023, 1, 5),
+        datetime(2023, 1, 31, 18),
+        datetime(2023, 2, 1),
+    ]
+    statements = [_statement(seed, date) for seed, date in enumerate(dates)]
+
+    def realized(statements) -> Decimal:
+        positions: dict = {}
+        for statement in statements:
+            apply_statement(positions, statement)
+        return sum((position.realized for position in positions.values()), Decimal(0))
+
+    with StatementStore(tmp_path / "statements.db") as store:
+        ledger = PositionLedger(store)
+        ledger.add([(str(seed), stm, None) for seed, stm in enumerate(statements)])
+
+        january = realized_profit(ledger, 2023, 1)
+        assert january == realized(statements[:3]) - realized(statements[:1])
+        assert january != 0
+        assert realized_profit(ledger, 2022, 12) == realized(statements[:1])
+        assert realized_profit(ledger, 2023, 2) == realized(statements) - realized(
+            statements[:3]
+        )
+        assert realized_profit(ledger, 2023, 3) == 0
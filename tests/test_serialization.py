@@ -0,0 +1,19 @@
+from datetime import date
+from decimal import Decimal
+
+from brokerage_statement import serialization
+from brokerage_statement.ledger import Position
+
+
+def test_decimals_keep_their_decimal_places():
+    value = {"cost": Decimal("10.280"), "amount": 3, "day": date(2022, 12, 5)}
+
+    serialized = serialization.dumps(value)
+
+    assert serialized == '{"cost": "10.280", "amount": 3, "day": "2022-12-05"}'
+    assert serialization.loads(serialized, ["cost"]) == {
+        **value,
+        "day": "2022-12-05",
+    }
+    assert str(serialization.loads(serialized, ["cost"])["cost"]) == "10.280"
+    assert serialization.decimal_fields(Position) == ["cost", "realized"]
@@ -0,0 +1,10 @@
+from benchmarks.startup import import_times
+
+
+def test_help_does_not_import_the_parser():
+    modules = import_times(("--help",))
+
+    assert "click" in modules
+    assert not {"pydantic", "pdfminer.high_level", "brokerage_statement.pdf"} & (
+        modules.keys()
+    )
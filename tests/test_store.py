@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+
+from benchmarks.synthetic import generate_statement
+from brokerage_statement.models import OperationType
+from brokerage_statement.store import StatementStore
+
+
+@pytest.fixture
+def _statement(make_statement):
+    def inner(day: int, security: str):
+        return make_statement(day, [(OperationType.BUY, security, 250, "10.28")])
+
+    return inner
+
+
+def test_store_queries_return_the_models(tmp_path, _statement):
+    with StatementStore(tmp_path / "statements.db") as store:
+        entries = [
+            ("a", _statement(5, "BBAS3"), "a.pdf"),
+            ("b", _statement(6, "ITSA4"), "b.pdf"),
+            ("c", _statement(7, "BBAS3"), None),
+        ]
+        assert store.add(entries) == 3
+        assert store.add(entries[:1]) == 0
+
+        assert store.get("b") == _statement(6, "ITSA4")
+        assert store.get("x") is None
+        assert list(store.statements(start=datetime(2022, 12, 6))) == [
+            _statement(6, "ITSA4"),
+            _statement(7, "BBAS3"),
+        ]
+        assert [
+            (date.day, item.security)
+            for date, item in store.items(
+                security="BBAS3", operation_type=OperationType.BUY
+            )
+        ] == [(5, "BBAS3"), (7, "BBAS3")]
+        assert list(store.items(operation_type=OperationType.SELL)) == []
+
+
+def test_ingesting_a_file_twice_is_a_no_op(tmp_path):
+    pdf_paths = []
+    for name, seed in (("a", 1), ("b", 2), ("a_copy", 1)):
+        pdf_path = tmp_path / f"{name}.pdf"
+        pdf_path.write_bytes(generate_statement(rows=3, seed=seed))
+        pdf_paths.append(str(pdf_path))
+
+    with StatementStore(tmp_path / "statements.db") as store:
+        summary = store.ingest(pdf_paths)
+        assert (summary.added, summary.skipped, summary.failures) == (2, 1, [])
+
+        summary = store.ingest(pdf_paths)
+        assert (summary.added, summary.skipped) == (0, 3)
+        assert len(list(store.statements())) == 2
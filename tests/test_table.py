@@ -0,0 +1,83 @@
+from benchmarks.synthetic import generate_statement
+from brokerage_statement.pdf.characters import CharacterStore
+from brokerage_statement.pdf.models import BrokerageStatementPdf
+from brokerage_statement.pdf.utils import Boundary, PDFPageIndex, extract_rows
+
+CHAR_WIDTH = 4.2
+
+
+def _page(cells: list[tuple[float, float, str]]) -> PDFPageIndex:
+    """Characters of `cells`, (x, baseline, text), one line each"""
+    store = CharacterStore()
+    for x, y, text in cells:
+        for idx, char in enumerate(text):
+            left = x + idx * CHAR_WIDTH
+            store.append_char(char, left, left + CHAR_WIDTH, y, y + 7.0)
+        store.append_anno("\n")
+    return PDFPageIndex(store.freeze())
+
+
+def test_rows_keep_empty_and_wrapped_cells_aligned():
+    columns = [
+        Boundary(left=10, right=80, top=100, bottom=0),
+        Boundary(left=90, right=130, top=100, bottom=0),
+        Boundary(left=140, right=150, top=100, bottom=0),
+    ]
+    page_index = _page(
+        [
+            (10, 80, "PETR4 ON NM"),
+            (90, 80.4, "100"),
+            (140, 80, "C"),
+            # Wraps on the next line
+            (10, 71, "VALE3 ON"),
+            (10, 62, "NM"),
+            (90, 71, "20"),
+            (140, 71, "V"),
+            # No amount
+            (10, 53, "ITUB4 PN"),
+            (140, 53, "C"),
+            # Between two columns
+            (82, 53, "x"),
+        ]
+    )
+
+    assert extract_rows(page_index, columns) == [
+        ("PETR4 ON NM", "100", "C"),
+        ("VALE3 ON", "20", "V"),
+        ("NM", "", ""),
+        ("ITUB4 PN", "", "C"),
+    ]
+
+
+def test_rows_add_spaces_between_words():
+    columns = [Boundary(left=0, right=100, top=100, bottom=0)]
+    page_index = _page([(0, 50, "BBAS3"), (30, 50, "ON")])
+
+    assert extract_rows(page_index, columns) == [("BBAS3 ON",)]
+
+
+def _table_rows(pdf_file: bytes) -> list[tuple[str, ...]]:
+    return BrokerageStatementPdf(pdf_file).securities_table
+
+
+def test_table_rows_of_every_page():
+    first_page = _table_rows(generate_statement(rows=20, pages=1, seed=4))
+    both_pages = _table_rows(generate_statement(rows=40, pages=2, seed=4))
+
+    # Each page starts with the titles of the columns
+    assert len(first_page) == 21 and len(both_pages) == 42
+    assert both_pages[:21] == first_page
+
+
+def test_table_skips_pages_without_every_column():
+    pdf_statement = BrokerageStatementPdf(generate_statement(rows=40, pages=2, seed=4))
+    second_page = pdf_statement.securities_table[21:]
+
+    pdf_statement = BrokerageStatementPdf(generate_statement(rows=40, pages=2, seed=4))
+    # The amount column was not found on the first page
+    pdf_statement.security_amount._boundaries = [
+        boundary
+        for boundary in pdf_statement.security_amount._boundaries
+        if boundary.page_index == 1
+    ]
+    assert pdf_statement.securities_table == second_page
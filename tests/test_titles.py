@@ -0,0 +1,68 @@
+from brokerage_statement.pdf.characters import CharacterStore
+from brokerage_statement.pdf.utils import TitleMatcher
+
+CHAR_WIDTH = 4.0
+
+
+def _page(*lines: str):
+    """Characters of `lines`, from the top of the page, "\n" as LTAnno"""
+    store = CharacterStore()
+    for line_idx, line in enumerate(lines):
+        y = 100.0 - 10 * line_idx
+        for idx, char in enumerate(line):
+            if char == "\n":
+                store.append_anno(char)
+                continue
+            left = idx * CHAR_WIDTH
+            store.append_char(char, left, left + CHAR_WIDTH, y, y + 7.0)
+        store.append_anno("\n")
+    return store.freeze()
+
+
+def _lefts(occurrences, title: str) -> list[tuple[int, float]]:
+    return [
+        (occurrence.page_index, occurrence.left)
+        for occurrence in occurrences.get(title, [])
+    ]
+
+
+def test_titles_sharing_a_prefix_or_overlapping():
+    matcher = TitleMatcher(["Data", "Data pregão", "pregão", "ta p"])
+
+    # The second "D" restarts the match instead of hiding it
+    occurrences = matcher.search([_page("DData pregão: 05/12/2022")])
+
+    assert _lefts(occurrences, "data") == [(0, 4.0)]
+    assert _lefts(occurrences, "data pregão") == [(0, 4.0)]
+    assert _lefts(occurrences, "ta p") == [(0, 12.0)]
+    assert _lefts(occurrences, "pregão") == [(0, 24.0)]
+    assert occurrences["data pregão"][0].right == 48.0
+
+
+def test_titles_ending_another_one():
+    matcher = TitleMatcher(["Valor das Operações", "Operações"])
+
+    occurrences = matcher.search([_page("VALOR DAS OPERAÇÕES", "Operações à termo")])
+
+    assert _lefts(occurrences, "valor das operações") == [(0, 0.0)]
+    assert _lefts(occurrences, "operações") == [(0, 40.0), (0, 0.0)]
+    assert occurrences["operações"][1].top == 97.0
+
+
+def test_annos_do_not_break_titles():
+    matcher = TitleMatcher(["Compra/Venda"])
+
+    occurrences = matcher.search([_page("Compra/\nVenda")])
+
+    assert _lefts(occurrences, "compra/venda") == [(0, 0.0)]
+
+
+def test_titles_do_not_continue_on_the_next_page():
+    matcher = TitleMatcher(["Data pregão"])
+
+    occurrences = matcher.search(
+        [_page("Nota", "Data pre"), _page("gão", "Data preço"), _page("Data pregão")]
+    )
+
+    # Found after the mismatches, on its own page
+    assert _lefts(occurrences, "data pregão") == [(2, 0.0)]
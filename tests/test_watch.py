@@ -0,0 +1,38 @@
+from benchmarks.synthetic import generate_statement
+from brokerage_statement.watch import DirectoryWatcher, ProcessedFile
+
+
+def _names(results) -> list[str]:
+    return [result.pdf_path.rsplit("/", 1)[-1] for result in results]
+
+
+def test_watcher_resumes_and_only_parses_new_or_changed_files(tmp_path):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    state_file = tmp_path / "state.jsonl"
+    for seed in range(2):
+        (inbox / f"{seed}.pdf").write_bytes(generate_statement(rows=3, seed=seed))
+    (inbox / "notes.txt").write_text("not a statement")
+    (inbox / "broken.pdf").write_bytes(b"%PDF-1.4 broken")
+
+    results = list(DirectoryWatcher(inbox, state_file, settle=0).run(once=True))
+
+    assert _names(results) == ["0.pdf", "1.pdf", "broken.pdf"]
+    assert [result.failed for result in results] == [False, False, True]
+    assert len(results[0].statement.items) == 3
+
+    # Restarted: failures are not retried until the file changes
+    (inbox / "1.pdf").write_bytes(generate_statement(rows=4, seed=1))
+    (inbox / "2.pdf").write_bytes(generate_statement(rows=2, seed=2))
+    (inbox / "0.pdf").unlink()
+
+    watcher = DirectoryWatcher(inbox, state_file, settle=0)
+    results = list(watcher.run(once=True))
+
+    assert _names(results) == ["1.pdf", "2.pdf"]
+    assert len(results[0].statement.items) == 4
+    assert list(DirectoryWatcher(inbox, state_file, settle=0).run(once=True)) == []
+    # The journal is compacted on start
+    with state_file.open() as file:
+        journal = [ProcessedFile.parse_raw(line).name for line in file]
+    assert sorted(journal) == ["1.pdf", "2.pdf", "broken.pdf"]